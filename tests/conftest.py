@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,17 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    # фоновые миниатюры пишут в MEDIA_ROOT и не должны пережить тест
+    settings.THUMBNAIL_BACKGROUND = False
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_cache(django_test_environment):
+    # не стирать cache.sqlite3 разработчика, см. core/test_runner.py
+    from core.test_runner import temporary_cache
+    with temporary_cache():
+        yield
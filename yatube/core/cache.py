@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+GENERATION_KEY = 'generation:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def scope_name(scope, *parts):
+    return '.'.join(str(part) for part in (scope, *parts))
+
+
+def _initial_generation():
+    # если счётчик вытеснили из кэша, новое значение всё равно больше
+    # любого старого, и закэшированные под ним фрагменты не всплывут
+    return int(time.time() * 1000)
+
+
+def get_generation(scope, *parts):
+    return cache.get_or_set(
+        GENERATION_KEY.format(scope_name(scope, *parts)),
+        _initial_generation,
+        timeout=None,
+    )
+
+
+def now_and_on_commit(func):
+    """Вызывает func сразу и, внутри транзакции, ещё раз после коммита.
+
+    Сразу — чтобы остаток транзакции не читал старый кэш. После
+    коммита — потому что конкурентный запрос до коммита ещё видит
+    старые данные и может успеть положить их в кэш заново.
+    """
+    func()
+    if connection.in_atomic_block:
+        transaction.on_commit(func)
+
+
+def bump_generation(scope, *parts):
+    now_and_on_commit(lambda: _bump(scope, *parts))
+
+
+def _bump(scope, *parts):
+    name = scope_name(scope, *parts)
+    key = GENERATION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), timeout=None)
+    cache.set(MODIFIED_KEY.format(name), time.time(), timeout=None)
+
+
+def get_modified(scope, *parts):
+    """Время последнего bump_generation для scope (timestamp).
+
+    Если отметка потерялась, считаем, что всё изменилось только что.
+    """
+    return cache.get_or_set(
+        MODIFIED_KEY.format(scope_name(scope, *parts)),
+        time.time,
+        timeout=None,
+    )
+
+
+def versioned_key(scope, *parts):
+    """Ключ вида 'follow.5.1712' для vary_on тега {% cache %}."""
+    return f'{scope_name(scope, *parts)}.{get_generation(scope, *parts)}'
@@ -0,0 +1,102 @@
+"""Чтение с реплик для read-only view.
+
+View, помеченные read_from_replica, на GET и HEAD читают со случайной
+реплики из REPLICA_DATABASES, всё остальное идёт в default. Реплики
+отстают от primary, поэтому:
+
+* запись внутри запроса переводит его остаток на primary;
+* после POST или записи PrimaryPinMiddleware ставит cookie, и в течение
+  REPLICA_PIN_SECONDS запросы этого браузера тоже читают с primary —
+  автор сразу видит свой пост и комментарий;
+* внутри transaction.atomic чтение всегда с primary.
+
+Ленты, страницы постов и профили кэшируются под поколениями из
+core/cache.py, которые сдвигаются при записи в primary. Прочитанное с
+отстающей реплики легло бы в кэш под новым поколением и жило бы до
+следующего сдвига. Поэтому такие view передают scopes: если какое-то
+из их поколений сдвигали последние REPLICA_MAX_LAG секунд, реплика
+могла ещё не догнать primary, и запрос читает с primary.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .cache import get_modified
+
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def pin_primary():
+    """Остаток запроса (и окно после него) читает с primary."""
+    _state.pinned = True
+
+
+def unpin():
+    _state.pinned = False
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def recently_changed(scopes):
+    """Сдвигали ли какое-то из поколений scopes за REPLICA_MAX_LAG."""
+    horizon = time.time() - settings.REPLICA_MAX_LAG
+    return any(get_modified(*scope) > horizon for scope in scopes)
+
+
+def read_from_replica(view=None, *, scopes=None):
+    """GET и HEAD view читают с реплики.
+
+    scopes(request, **kwargs) — поколения кэша, под которыми view
+    хранит результат; пока они свежее REPLICA_MAX_LAG, читаем с primary.
+    """
+    if view is None:
+        return partial(read_from_replica, scopes=scopes)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.REPLICA_DATABASES
+                or request.method not in ('GET', 'HEAD')
+                or PIN_COOKIE in request.COOKIES
+                or scopes is not None
+                and recently_changed(scopes(request, **kwargs))):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not settings.REPLICA_DATABASES
+                or not getattr(_state, 'replica', False)
+                or pinned()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии primary, объекты с них можно связывать
+        return True
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def make_cache(name, directory):
+    location = {
+        'locmem': 'bench',
+        'filebased': os.path.join(directory, 'filebased'),
+        'sqlite': os.path.join(directory, 'cache.sqlite3'),
+    }[name]
+    return import_string(BACKENDS[name])(
+        location, {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    )
+
+
+def write_in_child(name, directory):
+    make_cache(name, directory).set('shared', 'from-child')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache: '
+            'операций в секунду и видимость записи из другого процесса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=2000)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument(
+            '--backend', action='append', choices=sorted(BACKENDS),
+            help='Можно указать несколько раз; по умолчанию все.',
+        )
+
+    def timed(self, ops, func):
+        started = time.perf_counter()
+        for i in range(ops):
+            func(i)
+        return ops / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        value = 'x' * options['value_size']
+        self.stdout.write(
+            f'{"backend":<10}{"set/s":>10}{"get/s":>10}'
+            f'{"incr/s":>10}{"get_many/s":>12}  shared'
+        )
+        for name in options['backend'] or BACKENDS:
+            with tempfile.TemporaryDirectory() as directory:
+                cache = make_cache(name, directory)
+                cache.set('counter', 0)
+                sets = self.timed(ops, lambda i: cache.set(f'k{i}', value))
+                gets = self.timed(ops, lambda i: cache.get(f'k{i}'))
+                incrs = self.timed(ops, lambda i: cache.incr('counter'))
+                keys = [f'k{i}' for i in range(10)]
+                many = self.timed(ops // 10, lambda i: cache.get_many(keys))
+                child = multiprocessing.Process(
+                    target=write_in_child, args=(name, directory)
+                )
+                child.start()
+                child.join()
+                shared = cache.get('shared') == 'from-child'
+            self.stdout.write(
+                f'{name:<10}{sets:>10.0f}{gets:>10.0f}'
+                f'{incrs:>10.0f}{many:>12.0f}  {"yes" if shared else "no"}'
+            )
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.signals import apply_pragmas
+
+# упрощённые posts_post и posts_comment с индексом ленты
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY, text TEXT NOT NULL,'
+    ' pub_date REAL NOT NULL, comments_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE TABLE comment ('
+    ' id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL, text TEXT NOT NULL)',
+    'CREATE INDEX comment_post ON comment (post_id)',
+)
+TEXT = 'x' * 500
+
+
+def connect(path, pragmas):
+    # таймаут по умолчанию тот же, что у бэкенда Django
+    db = sqlite3.connect(path, check_same_thread=False)
+    apply_pragmas(db.cursor(), pragmas)
+    return db
+
+
+def create_post(db, number):
+    with db:
+        db.execute('INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                   (TEXT, time.time()))
+
+
+def add_comment(db, number):
+    # как add_comment: комментарий и счётчик поста в одной транзакции
+    post_id = number % 100 + 1
+    with db:
+        db.execute('INSERT INTO comment (post_id, text) VALUES (?, ?)',
+                   (post_id, TEXT))
+        db.execute('UPDATE post SET comments_count = comments_count + 1 '
+                   'WHERE id = ?', (post_id,))
+
+
+def read_index(db, number):
+    db.execute(
+        'SELECT id, text, comments_count FROM post '
+        'ORDER BY pub_date DESC LIMIT 10'
+    ).fetchall()
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, pragmas, operation, stop):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.operation = operation
+        self.stop = stop
+        self.done = 0
+        self.locked = 0
+
+    def run(self):
+        db = connect(self.path, self.pragmas)
+        try:
+            while not self.stop.is_set():
+                try:
+                    self.operation(db, self.done)
+                except sqlite3.OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    self.locked += 1
+                else:
+                    self.done += 1
+        finally:
+            db.close()
+
+
+class Command(BaseCommand):
+    help = ('Нагружает SQLite-файл потоками, которые создают посты, '
+            'пишут комментарии и читают ленту, без PRAGMA и с профилем '
+            'из SQLITE_PROFILES; печатает записи/с, чтения/с и число '
+            'ошибок «database is locked».')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--profile', action='append',
+            choices=sorted(settings.SQLITE_PROFILES),
+            help='Можно указать несколько раз; по умолчанию off и production.',
+        )
+
+    def handle(self, *args, **options):
+        if options['writers'] < 1 or options['readers'] < 1:
+            raise CommandError('Нужен хотя бы один писатель и один читатель.')
+        self.stdout.write(
+            f'{"profile":<12}{"writes/s":>10}{"reads/s":>10}{"locked":>8}'
+        )
+        for name in options['profile'] or ('off', 'production'):
+            with tempfile.TemporaryDirectory() as directory:
+                writes, reads, locked = self.run(
+                    os.path.join(directory, 'stress.sqlite3'),
+                    settings.SQLITE_PROFILES[name], options,
+                )
+            self.stdout.write(
+                f'{name:<12}{writes:>10.0f}{reads:>10.0f}{locked:>8}'
+            )
+
+    def run(self, path, pragmas, options):
+        db = connect(path, pragmas)
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+            db.executemany(
+                'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                [(TEXT, time.time())] * 100,
+            )
+        db.close()
+        stop = threading.Event()
+        writers = [
+            Worker(path, pragmas,
+                   add_comment if number % 2 else create_post, stop)
+            for number in range(options['writers'])
+        ]
+        readers = [
+            Worker(path, pragmas, read_index, stop)
+            for _ in range(options['readers'])
+        ]
+        workers = writers + readers
+        for worker in workers:
+            worker.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for worker in workers:
+            worker.join()
+        seconds = options['seconds']
+        return (
+            sum(worker.done for worker in writers) / seconds,
+            sum(worker.done for worker in readers) / seconds,
+            sum(worker.locked for worker in workers),
+        )
@@ -0,0 +1,182 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from . import db_router
+
+logger = logging.getLogger('yatube.performance')
+
+_state = threading.local()
+_MISSING = object()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.templates = defaultdict(float)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current_timings():
+    return getattr(_state, 'timings', None)
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        timings = current_timings()
+        if timings is None:
+            return render(self, context)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            # время включающее: в posts/index.html входят и его include
+            timings.templates[self.name or '<string>'] += (
+                time.perf_counter() - started
+            )
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version=version)
+        timings = current_timings()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version=version)
+        timings = current_timings()
+        if timings is not None:
+            timings.cache_hits += len(found)
+            timings.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _sql_timer(execute, sql, params, many, context):
+    timings = current_timings()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.queries += 1
+            timings.sql += time.perf_counter() - started
+
+
+def _instrument():
+    if not getattr(Template._render, 'instrumented', False):
+        Template._render = _timed_render(Template._render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _counted_get(backend.get)
+        if not getattr(backend.get_many, 'instrumented', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class ServerTimingMiddleware:
+    """Время SQL, шаблонов и кэша в заголовке Server-Timing и в логе.
+
+    Включается настройкой PERFORMANCE_INSTRUMENTATION.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrument()
+
+    def __call__(self, request):
+        timings = _state.timings = RequestTimings()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(_sql_timer)
+                    )
+                response = self.get_response(request)
+        finally:
+            _state.timings = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = self.header(timings, total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _ms(total),
+            'sql_queries': timings.queries,
+            'sql_ms': _ms(timings.sql),
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+            'templates_ms': {
+                name: _ms(spent) for name, spent in timings.templates.items()
+            },
+        }, ensure_ascii=False))
+        return response
+
+    @staticmethod
+    def header(timings, total):
+        metrics = [
+            f'db;dur={_ms(timings.sql)};desc="{timings.queries} queries"',
+            f'cache;desc="hit={timings.cache_hits} '
+            f'miss={timings.cache_misses}"',
+        ]
+        for number, (name, spent) in enumerate(timings.templates.items()):
+            metrics.append(f'tpl{number};dur={_ms(spent)};desc="{name}"')
+        metrics.append(f'total;dur={_ms(total)}')
+        return ', '.join(metrics)
+
+
+class PrimaryPinMiddleware:
+    """Ставит cookie, пока браузер после записи читает с primary.
+
+    Включается, если заданы REPLICA_DATABASES; см. core/db_router.py.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.unpin()
+        try:
+            response = self.get_response(request)
+            wrote = db_router.pinned()
+        finally:
+            db_router.unpin()
+        if wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                db_router.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return response
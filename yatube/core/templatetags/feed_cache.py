@@ -0,0 +1,26 @@
+import hashlib
+
+from django import template
+
+from ..cache import versioned_key
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(scope, *parts):
+    return versioned_key(scope, *parts)
+
+
+@register.simple_tag
+def page_version(page):
+    """Версия страницы постов по её содержимому: id и updated_at.
+
+    Для лент, которые и так выбираются на каждый запрос, как лента
+    подписок из Timeline: новый, удалённый или изменённый пост меняет
+    ключ сам, сбрасывать кэш каждому подписчику не нужно.
+    """
+    return hashlib.md5(' '.join(
+        f'{post.pk}:{post.updated_at.timestamp()}' for post in page
+    ).encode()).hexdigest()
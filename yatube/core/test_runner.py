@@ -0,0 +1,38 @@
+"""Тесты не трогают кэш разработчика.
+
+CACHES указывает на cache.sqlite3 рядом с проектом, и тесты, которые
+вызывают cache.clear(), стирали бы его. На время тестов кэш переезжает
+во временный каталог; TEST_RUNNER в settings подключает это к
+manage.py test, tests/conftest.py — к pytest.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def temporary_cache():
+    with tempfile.TemporaryDirectory(prefix='yatube-cache-') as directory:
+        caches = {
+            alias: dict(
+                config, LOCATION=os.path.join(directory, f'{alias}.sqlite3')
+            )
+            for alias, config in settings.CACHES.items()
+        }
+        with override_settings(CACHES=caches):
+            yield
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._temporary_cache = temporary_cache()
+        self._temporary_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._temporary_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,24 @@
+import os
+import tempfile
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         Client, RequestFactory, override_settings)
+
+from posts.models import Group, Post
+
+from . import db_router
+from .cache_backends import SQLiteCache
+from .signals import configure_sqlite
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +29,181 @@ class ViewTestClass(TestCase):
         response = self.guest_client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory.name, 'cache.sqlite3'),
+            {'OPTIONS': options},
+        )
+
+    def test_set_get_and_expiry(self):
+        """Значение читается до истечения таймаута."""
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.cache.set('short', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertFalse(self.cache.add('short', 3))
+
+    def test_shared_between_instances(self):
+        """Два экземпляра на одном файле видят записи друг друга."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+        self.cache.set('counter', 1)
+        self.assertEqual(self.make_cache().incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=4)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache._db.execute("UPDATE cache SET accessed = 0 WHERE key LIKE '%b'")
+        cache.set('d', 'd')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_many(['a', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+
+
+@override_settings(PERFORMANCE_INSTRUMENTATION=True)
+class ServerTimingTest(TestCase):
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с SQL, кэшем и шаблонами."""
+        cache.clear()
+        with self.assertLogs('yatube.performance', 'INFO') as logs:
+            response = Client().get('/')
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('cache;desc="hit=', header)
+        self.assertIn('desc="posts/index.html"', header)
+        self.assertIn('total;dur=', header)
+        self.assertIn('"path": "/"', logs.output[0])
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_disabled(self):
+        """Без настройки middleware не подключается."""
+        response = Client().get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        db_router.unpin()
+        self.addCleanup(db_router.unpin)
+
+    def view(self, request):
+        return HttpResponse(self.router.db_for_read(Post))
+
+    def test_reads_go_to_replica_only_in_marked_views(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        with db_router.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        view = db_router.read_from_replica(self.view)
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/')).content, b'replica1')
+        self.assertEqual(view(factory.post('/')).content, b'default')
+
+    def test_write_pins_rest_of_request(self):
+        with db_router.replica_reads():
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        """После записи браузер какое-то время читает с primary."""
+        request = RequestFactory().get('/')
+        request.COOKIES[db_router.PIN_COOKIE] = '1'
+        view = db_router.read_from_replica(self.view)
+        self.assertEqual(view(request).content, b'default')
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_PIN_SECONDS=7)
+class PrimaryPinMiddlewareTest(TestCase):
+    def test_cookie_after_write(self):
+        user = get_user_model().objects.create_user(username='author')
+        client = Client()
+        client.force_login(user)
+        client.get('/')
+        self.assertNotIn(db_router.PIN_COOKIE, client.cookies)
+        client.post('/create/', {'text': 'Новый пост'})
+        cookie = client.cookies[db_router.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 7)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class CachedPagesReadPrimaryTest(TransactionTestCase):
+    # внутри transaction.atomic роутер и так читает с primary
+    urls = ('/', '/group/group/', '/profile/author/')
+
+    def setUp(self):
+        cache.clear()
+        author = get_user_model().objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        self.urls += (f'/posts/{post.pk}/',)
+        # авторизованный клиент не попадает в кэш страниц анонимов
+        self.client = Client()
+        self.client.force_login(author)
+
+    def replica_reads(self, choice):
+        """Для каждой страницы: выбирал ли роутер реплику."""
+        reads = []
+        for url in self.urls:
+            choice.reset_mock()
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+            reads.append(choice.called)
+        return reads
+
+    def test_cached_pages_wait_replica_lag(self):
+        """Пока поколения свежее REPLICA_MAX_LAG, страницы читают primary."""
+        with mock.patch.object(db_router.random, 'choice',
+                               return_value='default') as choice:
+            self.assertEqual(self.replica_reads(choice), [False] * 4)
+            later = time.time() + settings.REPLICA_MAX_LAG + 1
+            with mock.patch.object(db_router.time, 'time',
+                                   return_value=later):
+                self.assertEqual(self.replica_reads(choice), [True] * 4)
+            choice.reset_mock()
+            self.client.get('/profile/author/followers/')
+            choice.assert_called()
+
+
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Профиль из SQLITE_PRAGMAS применён к соединению."""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+            configure_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), -1234)
+
+    def test_stress_command(self):
+        """stress_sqlite сравнивает профили под нагрузкой из потоков."""
+        out = StringIO()
+        call_command('stress_sqlite', writers=2, readers=2, seconds=0.2,
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines],
+                         ['profile', 'off', 'production'])
+        for line in lines[1:]:
+            writes, reads = map(float, line.split()[1:3])
+            self.assertGreater(writes, 0)
+            self.assertGreater(reads, 0)
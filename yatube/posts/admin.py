@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 
 from .models import Post, Group, Follow, Comment
+from .search import search_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +18,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # вместо icontains по всей таблице — полнотекстовый индекс
+        if not search_term:
+            return queryset, False
+        ids = search_ids(search_term, settings.POSTS_ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=ids), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
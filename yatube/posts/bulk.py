@@ -0,0 +1,81 @@
+"""Помощники для массовой вставки постов в обход сигналов."""
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from core.cache import bump_generation
+
+from .models import Follow, Timeline
+from .search import backend as search_backend
+from .signals import bump_user_stats, invalidate_feeds
+from .thumbnails import schedule_thumbnails
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Отключает auto_now_add у pub_date, чтобы задать даты самим."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bump_feed_generations(posts):
+    """Сбрасывает кэш тех же лент, что invalidate_feeds для поста."""
+    bump_generation('index')
+    for author_id in {post.author_id for post in posts}:
+        bump_generation('author', author_id)
+    for group_id in {post.group_id for post in posts} - {None}:
+        bump_generation('group', group_id)
+
+
+def posts_created(posts):
+    """Делает для постов из bulk_create то, что для одиночного поста
+    делают сигналы post_save: счётчики, ленты подписок, поисковый
+    индекс, сброс кэша лент и нарезку миниатюр.
+
+    У постов уже должны быть pk.
+    """
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    for author_id, author_posts in by_author.items():
+        bump_user_stats(author_id, 'posts_count', len(author_posts))
+
+    def entries():
+        follows = Follow.objects.filter(
+            author_id__in=by_author
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            for post in by_author[author_id]:
+                yield Timeline(user_id=user_id, post_id=post.pk,
+                               author_id=author_id, pub_date=post.pub_date)
+
+    for batch in batches(entries(), settings.TIMELINE_BATCH_SIZE):
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+    for post in posts:
+        search_backend.index(post)
+        if post.image:
+            transaction.on_commit(
+                lambda post=post: schedule_thumbnails(
+                    post.image.name,
+                    on_done=lambda: invalidate_feeds(type(post), post),
+                )
+            )
+    bump_feed_generations(posts)
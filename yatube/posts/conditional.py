@@ -0,0 +1,141 @@
+"""Условные GET для лент и страницы поста.
+
+ETag страницы собирается из id пользователя и поколений кэша (см.
+core/cache.py) тех групп, авторов и постов, что на ней показаны;
+сигналы сдвигают поколения при изменении постов, комментариев и
+подписок. У вошедших в ETag входит и CSRF-cookie: вход меняет токен,
+и форма комментария из старой копии страницы получила бы 403.
+Last-Modified — самая поздняя из дат: новейший pub_date на странице
+(у страницы поста — его updated_at) и время последнего сдвига тех же
+поколений, чтобы правка или удаление тоже меняли дату.
+
+Оба значения считаются до вызова view, поэтому на If-None-Match и
+If-Modified-Since ответ 304 уходит без запросов за постами и рендеринга.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.cache import get_generation, get_modified
+
+from .models import Group, Post, User
+
+
+def page_state(request, page, kwargs):
+    # etag_func и last_modified_func зовутся по очереди с одними
+    # аргументами: считаем состояние страницы один раз
+    if not hasattr(request, '_page_state'):
+        request._page_state = page(request, **kwargs)
+    return request._page_state
+
+
+def page_scopes(page):
+    """scopes для read_from_replica из той же функции page."""
+    def scopes(request, **kwargs):
+        return page_state(request, page, kwargs)[0]
+    return scopes
+
+
+def conditional_page(page, per_user=True):
+    """Оборачивает view в condition().
+
+    page(request, **kwargs) возвращает (scopes, newest): список scope
+    поколений, от которых зависит страница, и новейший pub_date на ней.
+    per_user=False — страница одинакова для всех, как RSS.
+    """
+    def etag(request, *args, **kwargs):
+        scopes, newest = page_state(request, page, kwargs)
+        parts = [request.user.pk or 0] if per_user else []
+        if per_user and request.user.is_authenticated:
+            parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        parts += [get_generation(*scope) for scope in scopes]
+        return hashlib.md5(
+            ':'.join(str(part) for part in parts).encode()
+        ).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        scopes, newest = page_state(request, page, kwargs)
+        dates = [
+            datetime.fromtimestamp(get_modified(*scope), tz=timezone.utc)
+            for scope in scopes
+        ]
+        if newest is not None:
+            dates.append(newest)
+        return max(dates, default=None)
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # хранить можно, но каждый раз сверяться с сервером
+            if per_user and request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def newest(posts):
+    return posts.order_by('-pub_date').values_list(
+        'pub_date', flat=True
+    ).first()
+
+
+def index_page(request):
+    return [('index',)], newest(Post.objects.all())
+
+
+def group_page(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first()
+    return (
+        [('group', group_id)],
+        newest(Post.objects.filter(group_id=group_id)),
+    )
+
+
+def author_page(request, username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    return (
+        [('author', author_id)],
+        newest(Post.objects.filter(author_id=author_id)),
+    )
+
+
+def profile_page(request, username):
+    scopes, newest_pub_date = author_page(request, username)
+    author_id = scopes[0][1]
+    # счётчики подписчиков и подписок
+    scopes.append(('profile', author_id))
+    if request.user.is_authenticated:
+        # кнопка «Подписаться/Отписаться»
+        scopes.append(('follow', request.user.pk))
+        # «кого почитать» в своём профиле
+        scopes.append(('suggestions', request.user.pk))
+    return scopes, newest_pub_date
+
+
+def post_page(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id', 'pub_date', 'updated_at'
+    ).first()
+    if post is None:
+        return [], None
+    # правки поста и счётчик постов автора отмечает поколение автора,
+    # новые комментарии — поколение comments
+    scopes = [('author', post['author_id']), ('comments', post_id)]
+    if post['group_id']:
+        scopes.append(('group', post['group_id']))
+    # updated_at сдвигают правка, комментарии и готовые варианты картинки
+    return scopes, max(post['pub_date'], post['updated_at'])
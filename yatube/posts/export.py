@@ -0,0 +1,72 @@
+"""Потоковая выгрузка постов и комментариев в CSV и JSONL.
+
+Строки читаются QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE) и сразу
+превращаются в текст, так что в памяти одновременно не больше одной
+пачки строк, сколько бы их ни было всего.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Comment, Post
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+FIELDS = {
+    'posts': (
+        ('id', 'pk'),
+        ('text', 'text'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('pub_date', 'pub_date'),
+        ('image', 'image'),
+        ('comments_count', 'comments_count'),
+    ),
+    'comments': (
+        ('id', 'pk'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+    ),
+}
+MODELS = {'posts': Post, 'comments': Comment}
+# порядок индексов лент: выгрузка автора или группы идёт по индексу,
+# без сортировки во временном B-дереве
+ORDERING = {'posts': ('pub_date', 'pk'), 'comments': ('pk',)}
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def rows(queryset, kind):
+    names, lookups = zip(*FIELDS[kind])
+    values = queryset.order_by(*ORDERING[kind]).values_list(*lookups)
+    for row in values.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield dict(zip(names, row))
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def render(queryset, kind, export_format):
+    """Генератор строк файла выгрузки."""
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(name for name, lookup in FIELDS[kind])
+        for row in rows(queryset, kind):
+            yield writer.writerow(_plain(value) for value in row.values())
+        return
+    for row in rows(queryset, kind):
+        yield json.dumps(
+            {name: _plain(value) for name, value in row.items()},
+            ensure_ascii=False,
+        ) + '\n'
@@ -0,0 +1,130 @@
+"""RSS и Atom: весь сайт, группа и автор.
+
+Готовый ответ ленты лежит в кэше под поколением её scope и живёт, пока
+сигналы поста не сдвинут поколение. Поверх этого conditional_page
+отвечает агрегаторам 304 по ETag и Last-Modified.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from core.cache import versioned_key
+
+from .conditional import (author_page, conditional_page, group_page,
+                          index_page, page_state)
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related(
+            'author', 'group'
+        )[:settings.COUNT_FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(10)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AtomPostsFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class AtomGroupFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AtomAuthorFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def cached_feed(feed, page):
+    """View ленты: ответ из кэша до сдвига поколения её scope."""
+    @conditional_page(page, per_user=False)
+    def view(request, **kwargs):
+        scopes, newest_pub_date = page_state(request, page, kwargs)
+        key = 'feed:{}:{}'.format(
+            request.path,
+            ':'.join(versioned_key(*scope) for scope in scopes),
+        )
+        response = cache.get(key)
+        if response is None:
+            response = feed(request, **kwargs)
+            cache.set(key, response, timeout=None)
+        return response
+    return view
+
+
+index_rss = cached_feed(PostsFeed(), index_page)
+index_atom = cached_feed(AtomPostsFeed(), index_page)
+group_rss = cached_feed(GroupFeed(), group_page)
+group_atom = cached_feed(AtomGroupFeed(), group_page)
+author_rss = cached_feed(AuthorFeed(), author_page)
+author_atom = cached_feed(AtomAuthorFeed(), author_page)
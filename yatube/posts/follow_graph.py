@@ -0,0 +1,85 @@
+"""Граф подписок в кэше.
+
+Для каждого пользователя в кэше лежат отсортированные id тех, на кого
+он подписан, и его подписчиков — массивы array('I'), по 4 байта на
+подписку. «Подписан ли» — двоичный поиск по массиву, пачка авторов
+проверяется за одно обращение к кэшу. Сигналы Follow удаляют ровно
+два ключа: подписки подписчика и подписчиков автора, сразу и ещё раз
+после коммита (см. invalidate).
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core.cache import now_and_on_commit
+
+from .models import Follow
+
+FOLLOWEES_KEY = 'followees:{}'
+FOLLOWERS_KEY = 'followers:{}'
+TYPECODE = 'I'
+
+
+def _unpack(data):
+    ids = array(TYPECODE)
+    ids.frombytes(data)
+    return ids
+
+
+def _load(key_template, field, other, user_ids):
+    """{user_id: массив id} для user_ids: кэш, а промахи — одним запросом."""
+    keys = {key_template.format(user_id): user_id for user_id in user_ids}
+    found = cache.get_many(list(keys))
+    graph = {keys[key]: _unpack(data) for key, data in found.items()}
+    missing = [user_id for user_id in user_ids if user_id not in graph]
+    if missing:
+        loaded = {user_id: array(TYPECODE) for user_id in missing}
+        # с primary: с отстающей реплики в кэш лёг бы старый граф,
+        # и исправить его было бы некому до следующей подписки
+        rows = Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+            **{f'{field}__in': missing}
+        ).order_by(field, other).values_list(field, other)
+        for user_id, other_id in rows.iterator():
+            loaded[user_id].append(other_id)
+        cache.set_many({
+            key_template.format(user_id): ids.tobytes()
+            for user_id, ids in loaded.items()
+        }, timeout=None)
+        graph.update(loaded)
+    return graph
+
+
+def followees(user_id):
+    """Отсортированные id авторов, на которых подписан user_id."""
+    return _load(FOLLOWEES_KEY, 'user_id', 'author_id', [user_id])[user_id]
+
+
+def followers(user_id):
+    """Отсортированные id подписчиков user_id."""
+    return _load(FOLLOWERS_KEY, 'author_id', 'user_id', [user_id])[user_id]
+
+
+def _contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def is_following(user, authors):
+    """{id автора: подписан ли user} для пачки авторов (объекты или id)."""
+    author_ids = [getattr(author, 'pk', author) for author in authors]
+    if not user.is_authenticated:
+        return dict.fromkeys(author_ids, False)
+    ids = followees(user.pk)
+    return {
+        author_id: _contains(ids, author_id) for author_id in author_ids
+    }
+
+
+def invalidate(follow):
+    keys = [
+        FOLLOWEES_KEY.format(follow.user_id),
+        FOLLOWERS_KEY.format(follow.author_id),
+    ]
+    now_and_on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,56 @@
+"""Нормализация картинок постов при загрузке.
+
+Оригинал с телефона уменьшается до POST_IMAGE_MAX_SIZE, поворачивается
+по EXIF-ориентации, теряет EXIF (геометку, модель камеры) и
+пережимается в POST_IMAGE_FORMAT. Результат пишется во временный файл,
+который переходит на диск после POST_IMAGE_SPOOL_SIZE байт, и хранилище
+читает его кусками, так что целиком в памяти картинка не лежит.
+
+Если пережатая картинка не меньше исходной, а уменьшать и чистить
+нечего, остаётся исходный файл. Анимации не трогаем.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+ALPHA_MODES = ('RGBA', 'LA', 'PA')
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+
+
+def _has_alpha(image):
+    return (image.mode in ALPHA_MODES
+            or (image.mode == 'P' and 'transparency' in image.info))
+
+
+def normalize_image(upload):
+    """Возвращает File с нормализованной картинкой или сам upload."""
+    upload.seek(0)
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    too_big = image.width > max_size[0] or image.height > max_size[1]
+    has_exif = bool(image.info.get('exif'))
+    # JPEG декодируется сразу в уменьшенном масштабе (DCT scaling):
+    # 20-мегапиксельное фото не разворачивается в память целиком
+    image.draft('RGB', max_size)
+    image = ImageOps.exif_transpose(image)
+    if too_big:
+        image.thumbnail(max_size, Image.LANCZOS)
+    image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+    image_format = settings.POST_IMAGE_FORMAT
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.POST_IMAGE_SPOOL_SIZE
+    )
+    image.save(output, image_format, quality=settings.POST_IMAGE_QUALITY)
+    if not too_big and not has_exif and output.tell() >= upload.size:
+        output.close()
+        upload.seek(0)
+        return upload
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=name + EXTENSIONS[image_format])
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Follow, Post, Timeline
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок (Timeline) по существующим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ленты перед заполнением.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TIMELINE_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['clear']:
+            Timeline.objects.all().delete()
+        created = 0
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            posts = Post.objects.filter(
+                author_id=author_id
+            ).values_list('id', 'pub_date')
+            with transaction.atomic():
+                entries = Timeline.objects.bulk_create(
+                    (
+                        Timeline(user_id=user_id, post_id=post_id,
+                                 author_id=author_id, pub_date=pub_date)
+                        for post_id, pub_date in posts.iterator()
+                    ),
+                    batch_size=batch_size,
+                    ignore_conflicts=True,
+                )
+            created += len(entries)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано записей ленты: {created}'
+        ))
@@ -0,0 +1,98 @@
+import os
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from posts.images import normalize_image
+
+
+def photo(width, height, seed):
+    """JPEG, похожий на снимок с телефона: шум, градиент и EXIF."""
+    noise = Image.effect_noise((width, height), 40 + seed)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (noise, gradient, gradient.rotate(90)))
+    exif = Image.Exif()
+    exif[0x0110] = 'Yatube Phone'  # Model
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=95, exif=exif)
+    return output.getvalue()
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def decode(data):
+    Image.open(BytesIO(data)).load()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает исходные картинки с нормализованными: байты, '
+            'время декодирования и время самой нормализации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Файлы картинок; без них генерируются снимки --size.',
+        )
+        parser.add_argument('--size', default='4000x3000')
+        parser.add_argument('--count', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def images(self, options):
+        if options['paths']:
+            for path in options['paths']:
+                with open(path, 'rb') as file:
+                    yield os.path.basename(path), file.read()
+            return
+        try:
+            width, height = map(int, options['size'].split('x'))
+        except ValueError:
+            raise CommandError('--size задаётся как ШИРИНАxВЫСОТА')
+        for seed in range(options['count']):
+            yield f'photo{seed}.jpg', photo(width, height, seed)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(
+            f'{"image":<20}{"orig KB":>9}{"new KB":>9}{"saved":>7}'
+            f'{"decode ms":>11}{"new ms":>8}{"normalize ms":>14}'
+        )
+        total_before = total_after = 0
+        for name, data in self.images(options):
+            result = None
+
+            def run():
+                nonlocal result
+                result = normalize_image(SimpleUploadedFile(name, data))
+
+            normalize_ms = best_of(repeat, run)
+            result.seek(0)
+            normalized = result.read()
+            before = best_of(repeat, lambda: decode(data))
+            after = best_of(repeat, lambda: decode(normalized))
+            total_before += len(data)
+            total_after += len(normalized)
+            self.stdout.write(
+                f'{name:<20}{len(data) / 1024:>9.0f}'
+                f'{len(normalized) / 1024:>9.0f}'
+                f'{1 - len(normalized) / len(data):>7.0%}'
+                f'{before:>11.1f}{after:>8.1f}{normalize_ms:>14.1f}'
+            )
+        if total_before:
+            self.stdout.write(self.style.SUCCESS(
+                f'{settings.POST_IMAGE_FORMAT}, не больше '
+                f'{"x".join(map(str, settings.POST_IMAGE_MAX_SIZE))}: '
+                f'сэкономлено {(total_before - total_after) / 1024:.0f} KB '
+                f'({1 - total_after / total_before:.0%})'
+            ))
@@ -0,0 +1,167 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все адреса posts: через тестовый клиент и сохраняет '
+            'p50/p95/p99, число SQL-запросов и пропускную способность.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Замеров на каждый адрес.',
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--user',
+            help='От чьего имени ходить; по умолчанию тот, у кого '
+                 'больше всего подписок.',
+        )
+        parser.add_argument(
+            '--clear-cache', action='store_true',
+            help='Очищать кэш перед каждым запросом (холодный кэш).',
+        )
+        parser.add_argument(
+            '--output',
+            help='Куда сохранить JSON с результатами; по умолчанию '
+                 'bench-views-<время>.json в текущем каталоге.',
+        )
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Для перцентилей нужно хотя бы 2 замера.')
+        user = self.get_user(options['user'])
+        client = Client()
+        client.force_login(user)
+        results = {}
+        started = time.perf_counter()
+        for name, url in self.urls(user):
+            results[name] = self.measure(client, url, options)
+        elapsed = time.perf_counter() - started
+        report = {
+            'created': timezone.now().isoformat(),
+            'user': user.username,
+            'clear_cache': options['clear_cache'],
+            'database': {
+                model.__name__: model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+            'throughput': sum(
+                result['requests'] for result in results.values()
+            ) / elapsed,
+            'results': results,
+        }
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)['results']
+        self.print_report(results, previous)
+        output = options['output'] or (
+            f'bench-views-{timezone.now():%Y%m%d-%H%M%S}.json'
+        )
+        with open(output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["throughput"]:.1f} запросов/с, результаты в {output}'
+        ))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Нет пользователя {username}')
+        stats = UserStats.objects.order_by('-following_count').first()
+        user = stats.user if stats else User.objects.first()
+        if user is None:
+            raise CommandError('База пуста, сначала запустите seed.')
+        return user
+
+    def urls(self, user):
+        """Все адреса posts: с аргументами, которые не меняют данные.
+
+        Подписка и отписка идут на собственный профиль и ничего не
+        делают, комментарий GET-запросом не создаётся.
+        """
+        post = Post.objects.filter(author=user).first() or Post.objects.first()
+        group = Group.objects.filter(posts__isnull=False).first()
+        values = {
+            'username': user.username,
+            'post_id': post.pk if post else None,
+            'slug': group.slug if group else None,
+            'kind': 'posts',
+        }
+        for pattern in posts_urls.urlpatterns:
+            kwargs = {key: values[key] for key in pattern.pattern.converters}
+            if None in kwargs.values():
+                self.stderr.write(f'{pattern.name}: нет данных, пропускаю')
+                continue
+            yield pattern.name, reverse(
+                f'{posts_urls.app_name}:{pattern.name}', kwargs=kwargs
+            )
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        latencies = []
+        queries = []
+        statuses = set()
+        for _ in range(options['requests']):
+            if options['clear_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    # выгрузки генерируются, пока их читают
+                    b''.join(response.streaming_content)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'requests': len(latencies),
+            'status': sorted(statuses),
+            **percentiles(latencies),
+            'queries': statistics.mean(queries),
+            'throughput': len(latencies) / (sum(latencies) / 1000),
+        }
+
+    def print_report(self, results, previous):
+        self.stdout.write(
+            f'{"url":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"queries":>9}{"req/s":>9}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<16}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                f'{result["p99"]:>9.2f}{result["queries"]:>9.1f}'
+                f'{result["throughput"]:>9.1f}'
+            )
+            if previous and name in previous:
+                change = result['p95'] / previous[name]['p95'] - 1
+                line += f'  p95 {change:+.0%}'
+            self.stdout.write(line)
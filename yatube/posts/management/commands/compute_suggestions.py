@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import SuggestionRefresh
+from posts.suggestions import compute, store
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Считает «кого почитать» для пользователей, чьи подписки или '
+            'обсуждения изменились; с --all — для всех.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать всех, а не только помеченных сигналами.',
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=settings.SUGGESTIONS_TOP_K,
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.SUGGESTIONS_BATCH_SIZE,
+            help='Сколько пользователей считать и записывать за раз.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = User.objects.order_by('pk')
+        if not options['all']:
+            stale = SuggestionRefresh.objects.values('user_id')
+            # метки удалённых пользователей считать незачем
+            SuggestionRefresh.objects.exclude(
+                user_id__in=users.values('pk')
+            ).delete()
+            users = users.filter(pk__in=stale)
+        user_ids = list(users.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        suggested = 0
+        for start in range(0, len(user_ids), batch_size):
+            results = compute(
+                user_ids[start:start + batch_size], options['top_k']
+            )
+            store(results)
+            suggested += sum(len(top) for top in results.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рекомендаций: {suggested}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
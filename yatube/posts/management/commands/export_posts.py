@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты или комментарии в CSV или JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind', choices=sorted(export.MODELS),
+        )
+        parser.add_argument(
+            '--format', choices=sorted(export.FORMATS), default='csv',
+        )
+        parser.add_argument('--author', help='Только посты автора.')
+        parser.add_argument('--group', help='Только посты группы (slug).')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout.',
+        )
+
+    def handle(self, *args, **options):
+        queryset = export.MODELS[options['kind']].objects.all()
+        if options['group'] and options['kind'] != 'posts':
+            raise CommandError('--group есть только у постов')
+        try:
+            if options['author']:
+                queryset = queryset.filter(
+                    author=User.objects.get(username=options['author'])
+                )
+            if options['group']:
+                queryset = queryset.filter(
+                    group=Group.objects.get(slug=options['group'])
+                )
+        except (User.DoesNotExist, Group.DoesNotExist) as error:
+            raise CommandError(error)
+        lines = export.render(queryset, options['kind'], options['format'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            file.writelines(lines)
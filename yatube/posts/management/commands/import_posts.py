@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import batches, explicit_pub_date, posts_created
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class LookupCache:
+    """LRU-кэш slug/username -> id, который дозапрашивает и заводит
+    недостающие записи одним запросом на пачку строк."""
+
+    def __init__(self, model, field, make, size):
+        self.model = model
+        self.field = field
+        self.make = make
+        self.size = size
+        self.ids = OrderedDict()
+
+    def resolve(self, values):
+        missing = {value for value in values if value not in self.ids}
+        if missing:
+            lookup = {f'{self.field}__in': missing}
+            found = dict(
+                self.model.objects.filter(**lookup)
+                .values_list(self.field, 'pk')
+            )
+            absent = missing - found.keys()
+            if absent:
+                self.model.objects.bulk_create(
+                    (self.make(value) for value in absent),
+                    ignore_conflicts=True,
+                )
+                lookup = {f'{self.field}__in': absent}
+                found.update(
+                    self.model.objects.filter(**lookup)
+                    .values_list(self.field, 'pk')
+                )
+            self.ids.update(found)
+        result = {}
+        for value in values:
+            self.ids.move_to_end(value)
+            result[value] = self.ids[value]
+        while len(self.ids) > self.size:
+            self.ids.popitem(last=False)
+        return result
+
+
+def read_rows(path, file_format):
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает посты из JSONL или CSV с полями text, '
+            'author, group, pub_date, image. Прерванную загрузку '
+            'продолжает с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='По умолчанию определяется по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одной транзакции.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; по умолчанию <path>.checkpoint.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на контрольную точку.',
+        )
+        parser.add_argument(
+            '--cache-size', type=int, default=10000,
+            help='Сколько авторов и групп держать в памяти.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl'
+        )
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        done = 0 if options['restart'] else self.read_checkpoint()
+        self.users = LookupCache(
+            User, 'username',
+            lambda username: User(username=username, password='!'),
+            options['cache_size'],
+        )
+        self.groups = LookupCache(
+            Group, 'slug',
+            lambda slug: Group(title=slug, slug=slug, description=''),
+            options['cache_size'],
+        )
+        rows = enumerate(read_rows(path, file_format), start=1)
+        if done:
+            self.stdout.write(f'Продолжаем после строки {done}')
+        started = time.perf_counter()
+        imported = skipped = 0
+        with explicit_pub_date(Post):
+            for batch in batches(rows, options['batch_size']):
+                if batch[-1][0] <= done:
+                    continue
+                batch = [(number, row) for number, row in batch
+                         if number > done]
+                created = self.import_batch(batch)
+                imported += created
+                skipped += len(batch) - created
+                self.write_checkpoint(batch[-1][0])
+                rate = imported / (time.perf_counter() - started)
+                self.stdout.write(
+                    f'Строка {batch[-1][0]}: загружено {imported}, '
+                    f'{rate:.0f} строк/с'
+                )
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {imported}, пропущено строк: {skipped}'
+        ))
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint) as file:
+                return json.load(file)['rows']
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, rows):
+        # сначала во временный файл: оборванная запись не испортит точку
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'rows': rows}, file)
+        os.replace(temporary, self.checkpoint)
+
+    def parse(self, number, row):
+        text = (row.get('text') or '').strip()
+        author = (row.get('author') or '').strip()
+        if not text or not author:
+            self.stderr.write(f'Строка {number}: нет text или author')
+            return None
+        pub_date = None
+        if row.get('pub_date'):
+            pub_date = parse_datetime(row['pub_date'])
+            if pub_date is None:
+                self.stderr.write(f'Строка {number}: непонятная дата')
+                return None
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        return {
+            'text': text,
+            'author': author,
+            'group': (row.get('group') or '').strip() or None,
+            'pub_date': pub_date or timezone.now(),
+            'image': (row.get('image') or '').strip(),
+        }
+
+    def attach_image(self, path):
+        """Имя файла в хранилище для поля image.
+
+        Относительный путь считается уже лежащим в хранилище и берётся
+        как есть. Файл по абсолютному пути копируется в хранилище
+        кусками, целиком в память он не читается.
+        """
+        if not os.path.isabs(path):
+            return path
+        upload_to = Post._meta.get_field('image').upload_to
+        with open(path, 'rb') as file:
+            return default_storage.save(
+                os.path.join(upload_to, os.path.basename(path)), File(file)
+            )
+
+    def import_batch(self, batch):
+        rows = [row for row in (self.parse(*item) for item in batch) if row]
+        if not rows:
+            return 0
+        with transaction.atomic():
+            authors = self.users.resolve({row['author'] for row in rows})
+            groups = self.groups.resolve(
+                {row['group'] for row in rows if row['group']}
+            )
+            posts = [
+                Post(
+                    text=row['text'],
+                    author_id=authors[row['author']],
+                    group_id=groups.get(row['group']),
+                    pub_date=row['pub_date'],
+                    image=self.attach_image(row['image'])
+                    if row['image'] else '',
+                )
+                for row in rows
+            ]
+            Post.objects.bulk_create(posts)
+            if posts[0].pk is None:
+                # SQLite не возвращает pk из bulk_create; после вставки
+                # транзакция держит блокировку записи, и последние
+                # len(posts) id — наши, в порядке вставки
+                pks = Post.objects.order_by('-pk').values_list(
+                    'pk', flat=True)[:len(posts)]
+                for post, pk in zip(posts, reversed(list(pks))):
+                    post.pk = pk
+            posts_created(posts)
+        return len(posts)
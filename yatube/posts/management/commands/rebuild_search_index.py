@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс постов перестроен'))
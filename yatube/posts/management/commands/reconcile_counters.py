@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def count_of(queryset, field):
+    """Подзапрос COUNT(*) по полю field, привязанный к внешнему pk."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=pk) for pk in User.objects.filter(
+                stats__isnull=True).values_list('pk', flat=True)),
+            ignore_conflicts=True,
+        )
+        # у UserStats pk совпадает с id пользователя
+        stats = UserStats.objects.update(
+            posts_count=count_of(Post.objects.all(), 'author'),
+            followers_count=count_of(Follow.objects.all(), 'author'),
+            following_count=count_of(Follow.objects.all(), 'user'),
+        )
+        posts = Post.objects.update(
+            comments_count=count_of(Comment.objects.all(), 'post'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {stats}, постов: {posts}'
+        ))
@@ -0,0 +1,154 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts.bulk import batches, explicit_pub_date
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# тексты берём из заранее сгенерированного набора: Faker на миллион
+# постов работал бы дольше самой вставки
+TEXT_POOL_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу пользователями, группами, постами, '
+            'комментариями и подписками для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до текущего момента разбросать посты.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.texts = [
+            self.faker.paragraph(nb_sentences=3)
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+        with explicit_pub_date(Post, Comment):
+            self.create_users(options['users'])
+            self.create_groups(options['groups'])
+            user_ids = list(User.objects.values_list('pk', flat=True))
+            group_ids = list(Group.objects.values_list('pk', flat=True))
+            self.create_posts(options['posts'], options['days'],
+                              user_ids, group_ids)
+            self.create_comments(options['comments'], user_ids)
+            self.create_follows(options['follows'], user_ids)
+        # bulk_create не шлёт сигналов: счётчики, ленты подписок,
+        # поисковый индекс и рекомендации досчитываем штатными командами
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('backfill_timeline', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('compute_suggestions', all=True, stdout=self.stdout)
+        cache.clear()
+
+    def bulk_create(self, model, objects, **kwargs):
+        total = 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+        self.stdout.write(f'{model.__name__}: {total}')
+
+    def create_users(self, count):
+        # хэш пароля считается долго, поэтому он общий: password
+        password = make_password('password')
+        offset = User.objects.count()
+        self.bulk_create(User, (
+            User(
+                username=f'{self.faker.user_name()}_{offset + i}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                email=self.faker.email(),
+                password=password,
+            )
+            for i in range(count)
+        ), ignore_conflicts=True)
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        self.bulk_create(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'group-{offset + i}',
+                description=self.random.choice(self.texts),
+            )
+            for i in range(count)
+        ), ignore_conflicts=True)
+
+    def create_posts(self, count, days, user_ids, group_ids):
+        # посты идут по времени в порядке вставки, как на живом сайте:
+        # id растёт вместе с pub_date
+        self.start = timezone.now() - timedelta(days=days)
+        self.step = timedelta(days=days) / max(count, 1)
+        self.last_post_id = (
+            Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+            or 0
+        )
+        groups = group_ids + [None] * (len(group_ids) // 3)
+        self.bulk_create(Post, (
+            Post(
+                text=self.random.choice(self.texts),
+                author_id=self.random.choice(user_ids),
+                group_id=self.random.choice(groups) if groups else None,
+                pub_date=self.start + self.step * i,
+            )
+            for i in range(count)
+        ))
+
+    def create_comments(self, count, user_ids):
+        post_ids = list(
+            Post.objects.filter(pk__gt=self.last_post_id)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        if not post_ids:
+            return
+        now = timezone.now()
+
+        def comment():
+            position = self.random.randrange(len(post_ids))
+            posted = self.start + self.step * position
+            return Comment(
+                post_id=post_ids[position],
+                author_id=self.random.choice(user_ids),
+                text=self.faker.sentence()[:200],
+                pub_date=posted + (now - posted) * self.random.random(),
+            )
+
+        self.bulk_create(Comment, (comment() for _ in range(count)))
+
+    def create_follows(self, count, user_ids):
+        pairs = set()
+        # не больше, чем вообще возможно пар без подписки на себя
+        count = min(count, len(user_ids) * (len(user_ids) - 1))
+        while len(pairs) < count:
+            user_id, author_id = self.random.sample(user_ids, 2)
+            pairs.add((user_id, author_id))
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ), ignore_conflicts=True)
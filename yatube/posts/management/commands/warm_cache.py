@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm, warmup_urls
+
+
+class Command(BaseCommand):
+    help = ('Заполняет кэш первыми страницами главной, каждой группы и '
+            'профилей самых популярных авторов; печатает время по адресам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.CACHE_WARMUP_PAGES,
+            help='Сколько первых страниц каждой ленты.',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=settings.CACHE_WARMUP_PROFILES,
+            help='Сколько профилей с наибольшим числом подписчиков.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.CACHE_WARMUP_WORKERS,
+        )
+        parser.add_argument(
+            '--host', default=settings.CACHE_WARMUP_HOST,
+            help='Заголовок Host запросов прогрева: только чтобы пройти '
+                 'ALLOWED_HOSTS, в ключ кэша страницы он не входит.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        urls = list(warmup_urls(options['pages'], options['profiles']))
+        failed = 0
+        for url, status, ms in warm(urls, options['workers'],
+                                    options['host']):
+            if status != 200:
+                failed += 1
+            self.stdout.write(f'{status} {ms:>8.1f} мс  {url}')
+        elapsed = time.perf_counter() - started
+        message = f'{len(urls)} адресов за {elapsed:.1f} с'
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f'{message}, с ошибкой {failed}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
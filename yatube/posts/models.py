@@ -22,11 +22,13 @@ class Post(models.Model):
                             )
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    # отдельные индексы по FK не нужны: их покрывают составные в Meta
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -35,18 +37,45 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name="posts",
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False,
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    # версия закэшированной карточки поста: save() обновляет её сам,
+    # сигналы комментариев и нарезка картинок — через update()
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    # JSON-манифест вариантов картинки для srcset, пишет его
+    # posts/thumbnails.py после нарезки
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Варианты картинки',
+    )
+    # поддерживается сигналами, см. posts/signals.py
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # ленты сортируются по (pub_date, id); id — это rowid и в SQLite
+        # неявно дописан в конец каждого индекса
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_feed_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:settings.TEST_LEN_TEXT]
@@ -57,6 +86,7 @@ class Comment(models.Model):
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -73,6 +103,12 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'pub_date'],
+                         name='comment_thread_idx'),
+        ]
+
 
 class Follow(models.Model):
     # пользователь, который подписывается
@@ -98,3 +134,94 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=["user", "author"],
                                     name="unique_follow")
         ]
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: строка на пару подписчик-пост.
+
+    Заполняется сигналами при публикации поста и при подписке/отписке,
+    чтобы follow_index читал ленту одним диапазоном по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    # автор и дата продублированы из поста для отписки и сортировки
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_feed_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, чтобы шаблоны не делали COUNT(*)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class Suggestion(models.Model):
+    """«Кого почитать»: top-K авторов для пользователя.
+
+    Считает команда compute_suggestions, страницы читают готовый список
+    одним запросом по индексу (user, rank).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        indexes = [
+            models.Index(fields=['user', 'rank'],
+                         name='suggestion_user_rank_idx'),
+        ]
+
+
+class SuggestionRefresh(models.Model):
+    """Пользователь, чьи рекомендации устарели; ставят сигналы.
+
+    Без внешнего ключа: при удалении пользователя каскад удаляет его
+    подписки и комментарии, и сигналы ставят метку тому, кого уже
+    удаляют. Такие метки убирает compute_suggestions.
+    """
+    user_id = models.PositiveIntegerField(primary_key=True)
@@ -0,0 +1,54 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Ключ — адрес страницы с query string и поколения scope из той же
+функции page(request, **kwargs), что у conditional_page: группы,
+автора, поста. Сигналы сдвигают поколение ровно тех scope, которых
+коснулось изменение, поэтому остальные страницы остаются в кэше, и
+хранить их можно часами.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import versioned_key
+
+from .conditional import page_state
+
+PAGE_KEY = 'page:{}:{}'
+
+
+def page_key(request, scopes):
+    # без схемы и хоста: страницы на всех адресах сайта одинаковы, и
+    # прогрев по http заполняет те же записи, что читают по https
+    url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(
+        url, ':'.join(versioned_key(*scope) for scope in scopes)
+    )
+
+
+def cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def anonymous_page_cache(page):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            scopes, newest = page_state(request, page, kwargs)
+            key = page_key(request, scopes)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if cacheable(response):
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
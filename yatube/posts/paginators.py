@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_token(direction, *values):
+    payload = json.dumps([direction, *values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Возвращает (direction, *values) или None для битого токена."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *values = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode()
+        )
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return (direction, *values)
+
+
+def encode_cursor(obj, direction=NEXT):
+    """Непрозрачный токен позиции в ленте: (pub_date, id) и направление."""
+    return encode_token(direction, obj.pub_date.isoformat(), obj.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, id) или None для битого токена."""
+    try:
+        direction, pub_date, pk = decode_token(token)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    if pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def cursor_page(object_list, paginator, has_next, has_previous,
+                next_token=None, previous_token=None):
+    """Страница keyset-пагинации: без номера и без COUNT(*).
+
+    Это обычный Page (шаблоны и тесты проверяют именно этот тип), у
+    которого has_next/has_previous известны заранее, а не считаются по
+    числу страниц. next_token/previous_token задают, если курсор
+    строится не по (pub_date, id) постов, как в поиске.
+    """
+    page = Page(object_list, None, paginator)
+    page.has_next = lambda: has_next
+    page.has_previous = lambda: has_previous
+    page.next_token = next_token
+    page.previous_token = previous_token
+    return page
+
+
+class CursorPaginator(Paginator):
+    """Paginator, который листает по курсору.
+
+    Страница по курсору строится одним запросом по индексу
+    (pub_date, id) и стоит одинаково на любой глубине ленты. Номера
+    страниц (get_page) остались только для старых ссылок ?page=N.
+    key — поля (дата, id поста) в object_list, unwrap — как достать
+    пост из строки выборки, если листаем не сами посты.
+    """
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'pk'),
+                 unwrap=None, **kwargs):
+        self.key = key
+        self.unwrap = unwrap
+        # id добивает порядок до строгого, иначе посты с одинаковой
+        # датой могут потеряться на границе страниц.
+        super().__init__(
+            object_list.order_by(*('-' + field for field in key)),
+            per_page, **kwargs
+        )
+
+    def _get_page(self, object_list, *args, **kwargs):
+        if self.unwrap is not None:
+            object_list = [self.unwrap(item) for item in object_list]
+        return super()._get_page(object_list, *args, **kwargs)
+
+    def _cursor_page(self, rows, has_next, has_previous):
+        if self.unwrap is not None:
+            rows = [self.unwrap(item) for item in rows]
+        return cursor_page(rows, self, has_next, has_previous)
+
+    def _after(self, pub_date, pk, lookup):
+        # (pub_date, id) < (d, i) записано так, чтобы первое условие
+        # давало диапазон по индексу, а не полный проход
+        date_field, id_field = self.key
+        return self.object_list.filter(
+            Q(**{f'{date_field}__{lookup}e': pub_date}),
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{f'{id_field}__{lookup}': pk}),
+        )
+
+    def get_cursor_page(self, token):
+        cursor = decode_cursor(token) if token else None
+        if cursor is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return self._cursor_page(
+                rows[:self.per_page],
+                has_next=len(rows) > self.per_page, has_previous=False,
+            )
+        direction, pub_date, pk = cursor
+        if direction == NEXT:
+            rows = list(
+                self._after(pub_date, pk, 'lt')[:self.per_page + 1]
+            )
+            return self._cursor_page(
+                rows[:self.per_page],
+                has_next=len(rows) > self.per_page, has_previous=True,
+            )
+        rows = list(
+            self._after(pub_date, pk, 'gt').order_by(*self.key)
+            [:self.per_page + 1]
+        )
+        if len(rows) <= self.per_page:
+            # упёрлись в начало ленты — отдаём полную первую страницу
+            return self.get_cursor_page(None)
+        return self._cursor_page(
+            rows[:self.per_page][::-1], has_next=True, has_previous=True,
+        )
+
+
+def thread_page(comments, token, per_page):
+    """Страница ветки комментариев от старых к новым.
+
+    Ветку дочитывают только вперёд, поэтому курсор (pub_date, id)
+    есть лишь у следующей страницы.
+    """
+    comments = comments.order_by('pub_date', 'pk')
+    cursor = decode_cursor(token) if token else None
+    if cursor is not None:
+        direction, pub_date, pk = cursor
+        comments = comments.filter(
+            Q(pub_date__gte=pub_date),
+            Q(pub_date__gt=pub_date) | Q(pk__gt=pk),
+        )
+    rows = list(comments[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return cursor_page(
+        rows, None, has_next, has_previous=cursor is not None,
+        next_token=encode_cursor(rows[-1]) if has_next else None,
+    )
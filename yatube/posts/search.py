@@ -0,0 +1,166 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд выбирается настройкой POSTS_SEARCH_BACKEND. По умолчанию это
+SQLiteFTSBackend: инвертированный индекс FTS5 в таблице posts_post_fts,
+которую создаёт миграция 0010_post_fts и обновляют сигналы поста.
+Для остальных СУБД есть SimpleBackend без индекса.
+
+search() возвращает страницу [(post_id, rank), ...]: чем меньше rank,
+тем выше результат. По (rank, post_id) листаем курсором.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .paginators import (NEXT, PREVIOUS, cursor_page, decode_token,
+                         encode_token)
+
+WORD_RE = re.compile(r'\w+')
+FTS_TABLE = 'posts_post_fts'
+
+
+class BaseSearchBackend:
+    def index(self, post):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, after=None, before=None):
+        """after/before — (rank, post_id) последней/первой строки
+        соседней страницы; before возвращает строки в обратном порядке."""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                'SELECT id, text FROM posts_post'
+            )
+
+    @staticmethod
+    def match_expression(query):
+        # пользовательский ввод не должен попасть в синтаксис FTS5:
+        # берём только слова и ищем их как префиксы
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, query, limit, after=None, before=None):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s')
+        params = [expression]
+        order = 'rank, rowid'
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [after[0], after[0], after[1]]
+        elif before is not None:
+            sql += ' AND (rank < %s OR (rank = %s AND rowid < %s))'
+            params += [before[0], before[0], before[1]]
+            order = 'rank DESC, rowid DESC'
+        sql += f' ORDER BY {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class SimpleBackend(BaseSearchBackend):
+    """Без индекса: icontains по тексту, свежие посты выше."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, after=None, before=None):
+        posts = Post.objects.all()
+        for word in WORD_RE.findall(query):
+            posts = posts.filter(text__icontains=word)
+        # rank — минус id, чтобы свежие посты шли первыми
+        if after is not None:
+            posts = posts.filter(pk__lt=after[1]).order_by('-pk')
+        elif before is not None:
+            posts = posts.filter(pk__gt=before[1]).order_by('pk')
+        else:
+            posts = posts.order_by('-pk')
+        return [
+            (pk, -pk) for pk in posts.values_list('pk', flat=True)[:limit]
+        ]
+
+
+backend = SimpleLazyObject(
+    lambda: import_string(settings.POSTS_SEARCH_BACKEND)()
+)
+
+
+def search_page(query, token, per_page):
+    """Страница результатов поиска по курсору (rank, post_id)."""
+    cursor = decode_token(token) if token else None
+    try:
+        direction, rank, pk = cursor
+        position = (float(rank), int(pk))
+    except (TypeError, ValueError):
+        direction = position = None
+    if direction == NEXT:
+        rows = backend.search(query, per_page + 1, after=position)
+        has_next, has_previous = len(rows) > per_page, True
+        rows = rows[:per_page]
+    elif direction == PREVIOUS:
+        rows = backend.search(query, per_page + 1, before=position)
+        if len(rows) <= per_page:
+            # упёрлись в начало выдачи — отдаём первую страницу
+            return search_page(query, None, per_page)
+        has_next, has_previous = True, True
+        rows = rows[:per_page][::-1]
+    else:
+        rows = backend.search(query, per_page + 1)
+        has_next, has_previous = len(rows) > per_page, False
+        rows = rows[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, rank in rows]
+    )
+    object_list = [posts[pk] for pk, rank in rows if pk in posts]
+    return cursor_page(
+        object_list, None, has_next, has_previous,
+        next_token=encode_token(NEXT, rows[-1][1], rows[-1][0])
+        if has_next else None,
+        previous_token=encode_token(PREVIOUS, rows[0][1], rows[0][0])
+        if has_previous and rows else None,
+    )
+
+
+def search_ids(query, limit):
+    return [pk for pk, rank in backend.search(query, limit)]
@@ -0,0 +1,278 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import bump_generation
+
+from . import follow_graph, suggestions
+from .models import (Comment, Follow, Group, Post, Timeline, User,
+                     UserStats)
+from .search import backend as search_backend
+from .thumbnails import schedule_thumbnails
+
+
+def bump_user_stats(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # строку не заводим: при удалении пользователя каскад приходит
+        # сюда, когда самого пользователя уже может не быть
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if not stats.update(**{field: F(field) + delta}):
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_stats(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    bump_user_stats(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            updated_at=timezone.now(),
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    Post.objects.filter(
+        pk=instance.post_id, comments_count__gt=0
+    ).update(
+        comments_count=F('comments_count') - 1,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_stats(instance.user_id, 'following_count', 1)
+        bump_user_stats(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    bump_user_stats(instance.user_id, 'following_count', -1)
+    bump_user_stats(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    followers = Follow.objects.filter(
+        author_id=instance.author_id
+    ).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        (
+            Timeline(user_id=user_id, post=instance,
+                     author_id=instance.author_id,
+                     pub_date=instance.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    posts = Post.objects.filter(
+        author_id=instance.author_id
+    ).values_list('id', 'pub_date')
+    Timeline.objects.bulk_create(
+        (
+            Timeline(user_id=instance.user_id, post_id=post_id,
+                     author_id=instance.author_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    Timeline.objects.filter(
+        user_id=instance.user_id,
+        author_id=instance.author_id,
+    ).delete()
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # при переносе поста в другую группу сбросить надо обе ленты групп
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_generation('index')
+    bump_generation('author', instance.author_id)
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    }
+    for group_id in group_ids - {None}:
+        bump_generation('group', group_id)
+    # ленту подписок не сбрасываем: её фрагмент версионируется самой
+    # страницей Timeline (см. page_version), а подписчиков бывает много
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation('follow', instance.user_id)
+        # счётчики подписчиков и подписок в профилях обоих
+        bump_generation('profile', instance.author_id)
+        bump_generation('profile', instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, raw=False, **kwargs):
+    follow_graph.invalidate(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_suggestions_on_follow(sender, instance, raw=False, **kwargs):
+    # подписки user — это друзья друзей для его подписчиков
+    if not raw:
+        suggestions.mark_stale([
+            instance.user_id, *follow_graph.followers(instance.user_id)
+        ])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_suggestions_on_comment(sender, instance, raw=False, **kwargs):
+    # у всех комментаторов поста поменялся счёт совместных обсуждений
+    if not raw:
+        suggestions.mark_stale([
+            instance.author_id,
+            *Comment.objects.filter(
+                post_id=instance.post_id
+            ).order_by().values_list('author_id', flat=True).distinct(),
+        ])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation('index')
+        bump_generation('group', instance.pk)
+
+
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def author_name(user):
+    return tuple(getattr(user, field) for field in AUTHOR_NAME_FIELDS)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_name(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    instance._previous_name = None
+    # вход сохраняет только last_login, имени это не касается
+    if update_fields is not None and not (
+        set(AUTHOR_NAME_FIELDS) & set(update_fields)
+    ):
+        return
+    if instance.pk and not raw:
+        instance._previous_name = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*AUTHOR_NAME_FIELDS).first()
+
+
+def touch_posts(posts):
+    """Сдвигает updated_at постов и поколения лент, где они показаны."""
+    rows = set(posts.order_by().values_list('author_id', 'group_id'))
+    if not rows:
+        return
+    posts.update(updated_at=timezone.now())
+    author_ids = {author_id for author_id, group_id in rows}
+    bump_generation('index')
+    for author_id in author_ids:
+        bump_generation('author', author_id)
+    for group_id in {group_id for author_id, group_id in rows} - {None}:
+        bump_generation('group', group_id)
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance, created, raw=False, **kwargs):
+    # имя автора есть в карточках постов, а их ключ — updated_at;
+    # имя комментатора — во фрагментах веток под его комментариями
+    previous = getattr(instance, '_previous_name', None)
+    if previous is not None and previous != author_name(instance):
+        touch_posts(Post.objects.filter(author=instance))
+        commented = Comment.objects.filter(
+            author=instance
+        ).order_by().values_list('post_id', flat=True).distinct()
+        for post_id in commented.iterator():
+            bump_generation('comments', post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, created=False, raw=False,
+                      **kwargs):
+    # ссылка на группу в карточках; после удаления у постов
+    # сменится и group_id
+    if not created and not raw:
+        touch_posts(Post.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_thread(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation('comments', instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, raw=False, **kwargs):
+    if not instance.image or raw:
+        return
+    name = instance.image.name
+    # лента подписок могла закэшировать заглушку вместо картинки
+    transaction.on_commit(lambda: schedule_thumbnails(
+        name, on_done=lambda: invalidate_feeds(sender, instance)
+    ))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_backend.index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search_backend.remove(instance.pk)
@@ -0,0 +1,138 @@
+"""Рекомендации «кого почитать».
+
+Счёт автора x для пользователя u складывается из двух разреженных
+произведений:
+
+    follow[u, x]  — сколько тех, на кого подписан u, подписаны на x (A·A);
+    comment[u, x] — под сколькими постами u и x оба комментировали (C·Cᵀ).
+
+score = follow * SUGGESTIONS_WEIGHTS['follow']
+      + comment * SUGGESTIONS_WEIGHTS['comment'].
+
+Матрицы держим строками — списками id, как в CSR, и строку
+произведения собираем по Густавсону: Counter.update по строкам
+соседей, сам подсчёт идёт в C. Работы на пользователя столько, сколько
+ненулевых в соседних строках, без прохода по всей таблице Follow.
+Кандидаты — только авторы постов, без самого u и тех, на кого он уже
+подписан.
+
+Считает команда compute_suggestions: по умолчанию только пользователей
+из SuggestionRefresh, куда их ставят сигналы подписок и комментариев.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from core.cache import bump_generation
+
+from .follow_graph import is_following
+from .models import (Comment, Follow, Suggestion, SuggestionRefresh,
+                     UserStats)
+
+# столько id за раз влезает в IN (...) на SQLite
+CHUNK_SIZE = 500
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _rows(queryset, key, value, keys):
+    """Строки разреженной матрицы {key: [value, ...]} для keys."""
+    rows = defaultdict(list)
+    for chunk in _chunks(keys):
+        pairs = queryset.filter(
+            **{f'{key}__in': chunk}
+        ).order_by().values_list(key, value).distinct()
+        for row, column in pairs.iterator():
+            rows[row].append(column)
+    return rows
+
+
+def compute(user_ids, top_k):
+    """{user_id: [(author_id, score), ...]} лучших top_k для user_ids."""
+    weights = settings.SUGGESTIONS_WEIGHTS
+    follows = Follow.objects.all()
+    comments = Comment.objects.all()
+    followees = _rows(follows, 'user_id', 'author_id', user_ids)
+    second = _rows(follows, 'user_id', 'author_id', {
+        author_id for row in followees.values() for author_id in row
+    })
+    commented = _rows(comments, 'author_id', 'post_id', user_ids)
+    commenters = _rows(comments, 'post_id', 'author_id', {
+        post_id for row in commented.values() for post_id in row
+    })
+    authors = set(UserStats.objects.filter(
+        posts_count__gt=0
+    ).values_list('user_id', flat=True))
+    result = {}
+    for user_id in user_ids:
+        via_follows = Counter()
+        for followee in followees.get(user_id, ()):
+            via_follows.update(second.get(followee, ()))
+        via_comments = Counter()
+        for post_id in commented.get(user_id, ()):
+            via_comments.update(commenters[post_id])
+        excluded = set(followees.get(user_id, ()))
+        excluded.add(user_id)
+        candidates = (via_follows.keys() | via_comments.keys()) & authors
+        scores = {
+            author_id: (weights['follow'] * via_follows[author_id]
+                        + weights['comment'] * via_comments[author_id])
+            for author_id in candidates - excluded
+        }
+        # при равном счёте — кто раньше зарегистрировался
+        result[user_id] = heapq.nlargest(
+            top_k, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+    return result
+
+
+def store(results):
+    """Заменяет рекомендации пользователей из results и снимает метку."""
+    user_ids = list(results)
+    with transaction.atomic():
+        for chunk in _chunks(user_ids):
+            Suggestion.objects.filter(user_id__in=chunk).delete()
+            SuggestionRefresh.objects.filter(user_id__in=chunk).delete()
+        Suggestion.objects.bulk_create(
+            Suggestion(user_id=user_id, author_id=author_id, score=score,
+                       rank=rank)
+            for user_id, top in results.items()
+            for rank, (author_id, score) in enumerate(top)
+        )
+    for user_id in user_ids:
+        bump_generation('suggestions', user_id)
+
+
+def mark_stale(user_ids):
+    SuggestionRefresh.objects.bulk_create(
+        (SuggestionRefresh(user_id=user_id) for user_id in set(user_ids)),
+        ignore_conflicts=True,
+    )
+
+
+def suggestions_for(user):
+    """Готовые рекомендации одним запросом по индексу (user, rank).
+
+    Авторов, на которых подписались после расчёта, отсеивает граф
+    подписок из кэша.
+    """
+    if not user.is_authenticated:
+        return []
+    suggestions = list(Suggestion.objects.filter(
+        user=user
+    ).select_related('author').order_by('rank')[
+        :settings.SUGGESTIONS_TOP_K
+    ])
+    following = is_following(
+        user, [suggestion.author_id for suggestion in suggestions]
+    )
+    return [
+        suggestion for suggestion in suggestions
+        if not following[suggestion.author_id]
+    ]
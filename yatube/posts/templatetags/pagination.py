@@ -0,0 +1,24 @@
+from django import template
+
+from ..paginators import NEXT, PREVIOUS, encode_cursor
+
+
+register = template.Library()
+
+
+@register.filter
+def next_cursor(page):
+    if getattr(page, 'next_token', None):
+        return page.next_token
+    if page.has_next() and page.object_list:
+        return encode_cursor(page[len(page) - 1], NEXT)
+    return ''
+
+
+@register.filter
+def previous_cursor(page):
+    if getattr(page, 'previous_token', None):
+        return page.previous_token
+    if page.has_previous() and page.object_list:
+        return encode_cursor(page[0], PREVIOUS)
+    return ''
@@ -0,0 +1,65 @@
+from django import template
+from django.db import transaction
+from sorl.thumbnail import default
+
+from ..thumbnails import (cached_thumbnail, cached_thumbnails,
+                          schedule_thumbnails, variants)
+
+
+register = template.Library()
+
+
+def _resolve(post, manifest, thumbnail):
+    if manifest is not None:
+        urls = [(width, default.storage.url(name))
+                for width, name in manifest['variants']]
+        return {
+            'src': urls[-1][1],
+            'srcset': ', '.join(f'{url} {width}w' for width, url in urls),
+        }
+    # манифеста нет: нарезаем варианты, даже если миниатюра ленты уже
+    # есть (пост со старых шаблонов); повторы и неудачи отсекает
+    # schedule_thumbnails. Вне транзакции запускается сразу, внутри —
+    # после её фиксации
+    name = post.image.name
+    transaction.on_commit(lambda: schedule_thumbnails(name))
+    if thumbnail is None:
+        return None
+    return {'src': thumbnail.url, 'srcset': ''}
+
+
+@register.simple_tag
+def prefetch_post_images(posts, preset='feed'):
+    """Готовит post_image для всей страницы постов.
+
+    Ставится перед циклом по page_obj: миниатюры постов без манифеста
+    ищутся в KV-хранилище sorl одним пакетом, а не по одной на пост.
+    """
+    posts = [post for post in posts if post.image]
+    manifests = {post.pk: variants(post) for post in posts}
+    thumbnails = cached_thumbnails(
+        [post.image for post in posts if manifests[post.pk] is None], preset
+    )
+    for post in posts:
+        post.prefetched_image = _resolve(
+            post, manifests[post.pk], thumbnails.get(post.image.name)
+        )
+    return ''
+
+
+@register.simple_tag
+def post_image(post, preset='feed'):
+    """src и srcset картинки поста или None, пока она режется в фоне.
+
+    srcset берётся из манифеста поста. Для постов, у которых манифеста
+    ещё нет, — готовая миниатюра preset из KV-хранилища sorl.
+    """
+    if not post.image:
+        return None
+    if hasattr(post, 'prefetched_image'):
+        return post.prefetched_image
+    manifest = variants(post)
+    thumbnail = None
+    if manifest is None:
+        thumbnail = cached_thumbnail(post.image, preset)
+    return _resolve(post, manifest, thumbnail)
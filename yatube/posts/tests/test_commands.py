@@ -0,0 +1,297 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .. import urls as posts_urls
+from ..models import (Comment, Follow, Group, Post, Suggestion,
+                      SuggestionRefresh, Timeline, UserStats)
+from ..search import search_ids
+
+User = get_user_model()
+
+
+class SeedCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed', users=20, groups=3, posts=200, comments=300, follows=40,
+            seed=1, stdout=StringIO(),
+        )
+
+    def test_volumes(self):
+        """seed создаёт заказанное число объектов."""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 40)
+
+    def test_dates_follow_ids(self):
+        """Даты постов растут вместе с id, комментарии не раньше поста."""
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(set(dates)), len(dates))
+        for comment in Comment.objects.select_related('post'):
+            self.assertGreaterEqual(comment.pub_date, comment.post.pub_date)
+
+    def test_derived_data(self):
+        """Счётчики и ленты подписок досчитаны после вставки."""
+        follow = Follow.objects.first()
+        self.assertEqual(
+            UserStats.objects.get(user_id=follow.user_id).following_count,
+            Follow.objects.filter(user_id=follow.user_id).count(),
+        )
+        self.assertEqual(
+            Timeline.objects.filter(user_id=follow.user_id,
+                                    author_id=follow.author_id).count(),
+            Post.objects.filter(author_id=follow.author_id).count(),
+        )
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_bench_views(self):
+        """bench_views замеряет каждый адрес posts: и сохраняет JSON."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_views', requests=2, warmup=0, output=output,
+                         stdout=StringIO(), stderr=StringIO())
+            out = StringIO()
+            call_command('bench_views', requests=2, warmup=0, output=output,
+                         compare=output, stdout=out, stderr=StringIO())
+            with open(output) as file:
+                report = json.load(file)
+        self.assertEqual(
+            set(report['results']),
+            {pattern.name for pattern in posts_urls.urlpatterns},
+        )
+        for result in report['results'].values():
+            self.assertLessEqual(result['p50'], result['p99'])
+            self.assertGreater(result['queries'], 0)
+        self.assertEqual(report['database']['Post'], 200)
+        self.assertIn('p95', out.getvalue())
+
+
+class BenchImagesTest(TestCase):
+    def test_bench_images(self):
+        """bench_images считает экономию байт на сгенерированных фото."""
+        out = StringIO()
+        call_command('bench_images', size='600x400', count=1, repeat=1,
+                     stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row[0], 'photo0.jpg')
+        self.assertLess(float(row[2]), float(row[1]))
+
+
+class WarmCacheTest(TransactionTestCase):
+    # потоки прогрева ходят в базу своими соединениями и должны видеть
+    # данные теста, поэтому без обёртки в транзакцию
+
+    def test_warm_cache(self):
+        """warm_cache запрашивает первые страницы лент и кладёт их в кэш."""
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        cache.clear()
+        out = StringIO()
+        call_command('warm_cache', pages=3, profiles=1, workers=2,
+                     host='testserver', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            sorted(line.split()[-1].split('?')[0] for line in lines[:-1]),
+            ['/', '/', '/group/group/', '/group/group/',
+             '/profile/author/', '/profile/author/'],
+        )
+        self.assertEqual(
+            sum('?cursor=' in line for line in lines[:-1]), 3
+        )
+        self.assertTrue(all(line.startswith('200') for line in lines[:-1]))
+        self.assertIsNone(self.client.get('/').context)
+
+
+class ComputeSuggestionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.friend, self.far, self.other, self.quiet = (
+            User.objects.create_user(username=name)
+            for name in ('user', 'friend', 'far', 'other', 'quiet')
+        )
+        for author in (self.friend, self.far, self.other):
+            Post.objects.create(text='Пост', author=author)
+        Follow.objects.create(user=self.user, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.far)
+        Follow.objects.create(user=self.friend, author=self.user)
+        Follow.objects.create(user=self.friend, author=self.quiet)
+        post = Post.objects.get(author=self.friend)
+        Comment.objects.create(post=post, author=self.user, text='Да')
+        Comment.objects.create(post=post, author=self.other, text='Нет')
+
+    def suggested(self, user):
+        return list(Suggestion.objects.filter(
+            user=user
+        ).order_by('rank').values_list('author__username', 'score'))
+
+    def test_compute_suggestions(self):
+        """Друзья друзей и соседи по обсуждениям, без себя и подписок."""
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertEqual(
+            self.suggested(self.user), [('far', 1.0), ('other', 0.5)]
+        )
+        self.assertFalse(SuggestionRefresh.objects.exists())
+
+    def test_only_stale_users(self):
+        """Без --all пересчитываются только помеченные сигналами."""
+        call_command('compute_suggestions', stdout=StringIO())
+        Post.objects.create(text='Пост', author=self.quiet)
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertEqual(len(self.suggested(self.user)), 2)
+        call_command('compute_suggestions', all=True, stdout=StringIO())
+        self.assertIn(('quiet', 1.0), self.suggested(self.user))
+
+    def test_signals_mark_stale(self):
+        """Подписка метит подписчиков, комментарий — всех комментаторов."""
+        call_command('compute_suggestions', stdout=StringIO())
+        Follow.objects.create(user=self.user, author=self.far)
+        self.assertEqual(
+            set(SuggestionRefresh.objects.values_list('user_id', flat=True)),
+            {self.user.pk, self.friend.pk},
+        )
+        SuggestionRefresh.objects.all().delete()
+        Comment.objects.create(post=Post.objects.get(author=self.friend),
+                               author=self.far, text='И я')
+        self.assertEqual(
+            set(SuggestionRefresh.objects.values_list('user_id', flat=True)),
+            {self.user.pk, self.other.pk, self.far.pk},
+        )
+
+    def test_deleted_user(self):
+        """Метки удалённых пользователей команда убирает."""
+        self.friend.delete()
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertFalse(SuggestionRefresh.objects.exists())
+
+
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def jsonl(self, rows):
+        return self.write('posts.jsonl', ''.join(
+            json.dumps(row, ensure_ascii=False) + '\n' for row in rows
+        ))
+
+    def test_import_jsonl(self):
+        """Посты, авторы и группы заводятся, производные данные тоже."""
+        path = self.jsonl([
+            {'text': f'Импорт {i}', 'author': 'author', 'group': 'news',
+             'pub_date': f'2020-01-0{i + 1}T10:00:00'}
+            for i in range(5)
+        ] + [{'text': 'Новичок', 'author': 'newcomer'},
+             {'text': 'Без автора'}])
+        err = StringIO()
+        call_command('import_posts', path, batch_size=2,
+                     stdout=StringIO(), stderr=err)
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertIn('Строка 7', err.getvalue())
+        group = Group.objects.get(slug='news')
+        self.assertEqual(group.posts.count(), 5)
+        self.assertTrue(User.objects.filter(username='newcomer').exists())
+        self.assertEqual(
+            Post.objects.filter(author=self.author)
+            .order_by('pub_date').first().pub_date.day,
+            1,
+        )
+        self.assertEqual(self.author.stats.posts_count, 5)
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(len(search_ids('Импорт', 10)), 5)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_refreshes_feeds(self):
+        """После импорта ленты группы и автора показывают новые посты."""
+        cache.clear()
+        Group.objects.create(title='Новости', slug='news',
+                             description='Описание')
+        urls = ['/group/news/', '/group/news/rss/', '/profile/author/rss/']
+        for url in urls:
+            self.assertNotContains(self.client.get(url), 'Импорт')
+        path = self.jsonl([
+            {'text': 'Импорт', 'author': 'author', 'group': 'news'}
+        ])
+        call_command('import_posts', path, stdout=StringIO())
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Импорт')
+
+    def test_import_csv(self):
+        """CSV читается так же, как JSONL."""
+        path = self.write(
+            'posts.csv',
+            'text,author,group\n"Пост, с запятой",author,\nВторой,author,\n',
+        )
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Пост, с запятой', 'Второй'},
+        )
+
+    def test_resume_from_checkpoint(self):
+        """Загрузка продолжается после строк из контрольной точки."""
+        path = self.jsonl([
+            {'text': f'Пост {i}', 'author': 'author'} for i in range(5)
+        ])
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump({'rows': 3}, file)
+        call_command('import_posts', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 3', 'Пост 4'],
+        )
+
+    def test_image_is_copied_into_storage(self):
+        """Картинка по абсолютному пути попадает в хранилище."""
+        image = self.write('picture.gif', 'GIF89a')
+        media = os.path.join(self.directory.name, 'media')
+        path = self.jsonl([{'text': 'С картинкой', 'author': 'author',
+                            'image': image}])
+        with override_settings(MEDIA_ROOT=media):
+            call_command('import_posts', path, stdout=StringIO())
+            post = Post.objects.get()
+            self.assertEqual(post.image.name, 'posts/picture.gif')
+            self.assertTrue(post.image.storage.exists(post.image.name))
+
+
+class ExportPostsTest(TestCase):
+    def test_export_round_trip(self):
+        """Выгрузку export_posts можно снова загрузить import_posts."""
+        author = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=author)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.jsonl')
+            call_command('export_posts', 'posts', format='jsonl',
+                         author='author', output=path)
+            Post.objects.all().delete()
+            call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 0', 'Пост 1', 'Пост 2'],
+        )
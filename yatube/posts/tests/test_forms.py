@@ -1,4 +1,5 @@
 from http import HTTPStatus
+from io import BytesIO
 import shutil
 import tempfile
 
@@ -7,6 +8,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
 from ..models import Group, Post, Comment
 
@@ -235,3 +237,46 @@ class CommentFormTests(TestCase):
                              f"{reverse('posts:add_comment', args=args)}"
                              )
         self.assertEqual(Comment.objects.count(), comment_count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=(200, 200))
+class ImageNormalizationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, image_format, size, **save_options):
+        output = BytesIO()
+        Image.new('RGB', size, 'red').save(output, image_format,
+                                           **save_options)
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'С картинкой',
+            'image': SimpleUploadedFile(name, output.getvalue()),
+        })
+        return Post.objects.latest('id').image
+
+    def test_photo_is_normalized(self):
+        """Фото уменьшено, повёрнуто по EXIF, без EXIF и в WEBP."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повернуть на 90°
+        exif[0x0110] = 'Phone'
+        stored = self.upload('photo.jpg', 'JPEG', (800, 400), exif=exif)
+        self.assertEqual(stored.name, 'posts/photo.webp')
+        with Image.open(stored.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (100, 200))
+            self.assertFalse(image.info.get('exif'))
+
+    def test_small_image_kept_when_not_smaller(self):
+        """Маленький файл без EXIF, который не ужимается, не трогаем."""
+        stored = self.upload('dot.gif', 'GIF', (1, 1))
+        self.assertEqual(stored.name, 'posts/dot.gif')
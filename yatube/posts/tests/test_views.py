@@ -1,14 +1,33 @@
+import json
 import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
 
-from ..models import Group, Post, Follow, Comment
+from core.cache import get_generation
+
+from ..models import Group, Post, Follow, Comment, Timeline
+from ..templatetags.pagination import next_cursor, previous_cursor
+from ..signals import invalidate_feeds
+from ..follow_graph import (FOLLOWEES_KEY, FOLLOWERS_KEY, followees,
+                            followers, is_following)
+from ..thumbnails import generate_thumbnails, schedule_thumbnails
 
 User = get_user_model()
 
@@ -187,15 +206,52 @@ class TaskPagesTests(TestCase):
         """Кэширование страницы выполняется корректно."""
         path = reverse('posts:index')
         response = self.authorized_client.get(path)
-        content_before_delete = response.content
-        Post.objects.last().delete()
+        content_before_update = response.content
+        # update() не шлёт сигналов — фрагмент остаётся в кэше
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый текст')
         response = self.authorized_client.get(path)
-        content_after_delete = response.content
-        self.assertEqual(content_before_delete, content_after_delete)
+        self.assertEqual(response.content, content_before_update)
         cache.clear()
         response = self.authorized_client.get(path)
-        content_after_cache_clear = response.content
-        self.assertNotEqual(content_after_cache_clear, content_before_delete)
+        self.assertNotEqual(response.content, content_before_update)
+
+    def test_index_page_cache_invalidated(self):
+        """Удаление поста сбрасывает кэш главной страницы."""
+        path = reverse('posts:index')
+        content_before_delete = self.authorized_client.get(path).content
+        Post.objects.last().delete()
+        response = self.authorized_client.get(path)
+        self.assertNotEqual(response.content, content_before_delete)
+
+    def test_follow_page_cache_is_per_user(self):
+        """Кэш ленты подписок у каждого пользователя свой."""
+        Follow.objects.create(user=self.user_other, author=self.user)
+        path = reverse('posts:follow_index')
+        other_content = self.authorized_client_other.get(path).content
+        another_content = self.authorized_client_another.get(path).content
+        self.assertIn(self.post.text.encode(), other_content)
+        self.assertNotIn(self.post.text.encode(), another_content)
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.authorized_client_other.get(path)
+        self.assertIn('Свежий пост'.encode(), response.content)
+
+    def test_edit_does_not_touch_followers_cache(self):
+        """Правка поста не пишет в кэш по ключу на каждого подписчика."""
+        Follow.objects.create(user=self.user_other, author=self.user)
+        path = reverse('posts:follow_index')
+        self.authorized_client_other.get(path)
+        for number in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'fan{number}'),
+                author=self.user,
+            )
+        post = Post.objects.get(pk=self.post.pk)
+        with mock.patch('posts.signals.bump_generation') as bump:
+            post.text = 'Исправленный пост'
+            post.save()
+        self.assertNotIn('follow', [call.args[0] for call in bump.mock_calls])
+        response = self.authorized_client_other.get(path)
+        self.assertIn('Исправленный пост'.encode(), response.content)
 
     def test_follow(self):
         """Проверка profile_follow."""
@@ -243,6 +299,9 @@ class PaginatorTests(TestCase):
                 group=cls.group
             )
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         """Главная страница отображает 10 записей."""
         response = self.client.get(reverse('posts:index'))
@@ -292,6 +351,60 @@ class PaginatorTests(TestCase):
         self.assertEqual(len(response.context['page_obj']),
                          settings.THREE_POSTS)
 
+    def test_cursor_pages(self):
+        """Курсорная пагинация листает ленту вперёд и назад."""
+        first_page = self.client.get(
+            reverse('posts:index')).context['page_obj']
+        response = self.client.get(
+            reverse('posts:index') + '?cursor=' + next_cursor(first_page))
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), settings.THREE_POSTS)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertNotIn(second_page[0], list(first_page))
+        response = self.client.get(
+            reverse('posts:index') + '?cursor='
+            + previous_cursor(second_page))
+        self.assertEqual(list(response.context['page_obj']),
+                         list(first_page))
+
+    def test_cursor_page_has_no_count_query(self):
+        """Страница по курсору строится одним запросом без COUNT."""
+        first_page = self.client.get(
+            reverse('posts:group_list', kwargs={
+                'slug': PaginatorTests.group.slug
+            })).context['page_obj']
+        paginator = first_page.paginator.__class__(
+            Post.objects.all(), settings.COUNT_POSTS)
+        with self.assertNumQueries(1):
+            page = paginator.get_cursor_page(next_cursor(first_page))
+            self.assertEqual(len(page), settings.THREE_POSTS)
+
+    def test_landing_pages_without_count(self):
+        """Первые страницы лент без COUNT(*) и без ссылок ?page=N."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[PaginatorTests.group.slug]),
+            reverse('posts:profile', args=[PaginatorTests.user.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                ])
+                self.assertContains(response, '?cursor=')
+                self.assertNotContains(response, '?page=')
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?cursor=xx')
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.COUNT_POSTS)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
 
 class CommentTest(TestCase):
     @classmethod
@@ -346,3 +459,746 @@ class CommentTest(TestCase):
             with self.subTest(field=value):
                 form_field = form.fields.get(value)
                 self.assertIsInstance(form_field, expected)
+
+
+@override_settings(COUNT_COMMENTS=2)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.commentators = [
+            User.objects.create_user(username=f'commentator{i}')
+            for i in range(3)
+        ]
+        for i, commentator in enumerate(cls.commentators):
+            Comment.objects.create(post=cls.post, author=commentator,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.commentators[0])
+        self.url = reverse('posts:post_detail', args=[self.post.id])
+
+    def comment_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in context.captured_queries
+            if 'posts_comment' in query['sql']
+        ]
+
+    def test_thread_pages(self):
+        """Комментарии листаются курсором от старых к новым."""
+        response = self.client.get(self.url)
+        first = response.context['comments']
+        self.assertEqual([c.text for c in first],
+                         ['Комментарий 0', 'Комментарий 1'])
+        self.assertTrue(first.has_next())
+        response = self.client.get(f'{self.url}?cursor={first.next_token}')
+        second = response.context['comments']
+        self.assertEqual([c.text for c in second], ['Комментарий 2'])
+        self.assertFalse(second.has_next())
+        self.assertContains(response, 'Первые комментарии')
+
+    def test_authors_are_joined(self):
+        """Авторы комментариев приходят тем же запросом."""
+        response, queries = self.comment_queries(self.url)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('auth_user', queries[0])
+        self.assertContains(response, 'commentator1')
+
+    def test_thread_fragment_cached(self):
+        """Ветка берётся из кэша, пока не добавят комментарий."""
+        self.comment_queries(self.url)
+        response, queries = self.comment_queries(self.url)
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'Комментарий 1')
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            data={'text': 'Комментарий 3'},
+        )
+        cursor = next_cursor(self.client.get(self.url).context['comments'])
+        response, queries = self.comment_queries(f'{self.url}?cursor={cursor}')
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Комментарий 3')
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.post = Post.objects.create(text='Старый пост', author=cls.author)
+
+    def get_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_fills_timeline(self):
+        """Подписка добавляет в ленту старые и новые посты автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.get_feed(), [new_post, self.post])
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(user=self.follower).delete()
+        self.assertFalse(Timeline.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_backfill_timeline(self):
+        """Команда backfill_timeline восстанавливает ленту."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertEqual(self.get_feed(), [self.post])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                    b'\x0A\x00\x3B'
+                ),
+                content_type='image/gif',
+            ),
+        )
+
+    def setUp(self):
+        # KV-хранилище sorl живёт в кэше и переживает откат транзакции
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а не нарезка в запросе."""
+        path = reverse('posts:post_detail', args=[self.post.id])
+        first = self.client.get(path).content.decode()
+        self.assertIn('bg-light', first)
+        self.assertNotIn('<img class="card-img', first)
+        # как в сигнале: готовые миниатюры сбрасывают кэш страниц поста
+        generate_thumbnails(
+            self.post.image.name,
+            on_done=lambda: invalidate_feeds(Post, self.post),
+        )
+        second = self.client.get(path).content.decode()
+        self.assertIn('<img class="card-img', second)
+
+    def test_page_thumbnails_in_one_lookup(self):
+        """Миниатюры страницы профиля ищутся в KV sorl одним запросом."""
+        author = User.objects.create_user(username='gallery')
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'Картинка {number}',
+                author=author,
+                image=SimpleUploadedFile(f'gallery{number}.gif',
+                                         self.post.image.read()),
+            )
+            self.post.image.seek(0)
+            for geometry, options in settings.POST_THUMBNAILS.values():
+                get_thumbnail(post.image.name, geometry, **options)
+        cache.clear()
+        with mock.patch.object(KVStore, '_get_raw') as get, \
+                CaptureQueriesContext(connection) as queries:
+            content = self.client.get(
+                reverse('posts:profile', args=['gallery'])
+            ).content.decode()
+        get.assert_not_called()
+        self.assertEqual(content.count('<img class="card-img'), 3)
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]), 1)
+        cache.clear()
+        with mock.patch(
+            'posts.templatetags.post_thumbnails.transaction'
+        ) as scheduled:
+            self.client.get(reverse('posts:profile', args=['gallery']))
+        # миниатюры есть, а манифеста вариантов для srcset ещё нет
+        self.assertEqual(scheduled.on_commit.call_count, 3)
+
+    @override_settings(THUMBNAIL_BACKGROUND=False)
+    def test_failed_image_not_retried(self):
+        """Картинку, которую не удалось нарезать, не режут на каждом показе."""
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        side_effect=OSError) as cut, \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            schedule_thumbnails('posts/broken.gif')
+            schedule_thumbnails('posts/broken.gif')
+        self.assertEqual(cut.call_count, 1)
+
+    def test_srcset_from_manifest(self):
+        """После нарезки srcset строится из манифеста, без KV sorl."""
+        output = BytesIO()
+        Image.new('RGB', (1000, 400), 'blue').save(output, 'PNG')
+        post = Post.objects.create(
+            text='Широкая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('wide.png', output.getvalue()),
+        )
+        generate_thumbnails(post.image.name)
+        post.refresh_from_db()
+        widths = [width for width, name in
+                  json.loads(post.image_variants)['variants']]
+        self.assertEqual(widths[:3], [320, 640, 960])
+        cache.clear()
+        with mock.patch(
+            'posts.templatetags.post_thumbnails.cached_thumbnail'
+        ) as lookup, mock.patch(
+            'posts.templatetags.post_thumbnails.transaction'
+        ) as scheduled:
+            content = self.client.get(
+                reverse('posts:post_detail', args=[post.id])
+            ).content.decode()
+        lookup.assert_not_called()
+        scheduled.on_commit.assert_not_called()
+        self.assertIn(' 320w, ', content)
+        self.assertIn('srcset="', content)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.posts = [
+            Post.objects.create(text=f'Заметка про котов номер {i}',
+                                author=cls.user)
+            for i in range(settings.COUNT_POSTS + settings.THREE_POSTS)
+        ]
+        cls.dog_post = Post.objects.create(text='Собаки лучше',
+                                           author=cls.user)
+
+    def test_search_finds_indexed_posts(self):
+        """Поиск находит посты по словам и префиксам, постранично."""
+        path = reverse('posts:search')
+        response = self.client.get(path, {'q': 'КОТ'})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), settings.COUNT_POSTS)
+        self.assertNotIn(self.dog_post, list(page))
+        response = self.client.get(
+            path, {'q': 'кот', 'cursor': next_cursor(page)})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), settings.THREE_POSTS)
+        self.assertFalse(set(page) & set(second_page))
+
+    def test_search_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        path = reverse('posts:search')
+        self.dog_post.text = 'Теперь про попугаев'
+        self.dog_post.save()
+        response = self.client.get(path, {'q': 'попугаев'})
+        self.assertEqual(list(response.context['page_obj']), [self.dog_post])
+        self.dog_post.delete()
+        response = self.client.get(path, {'q': 'попугаев'})
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_search_ignores_fts_syntax(self):
+        """Спецсимволы запроса не ломают поиск."""
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': '"кот" OR NEAR(*'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_uses_search_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'собаки'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog_post])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост, {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(4)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.staff,
+                               text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_profile_export_csv(self):
+        """Посты автора выгружаются в CSV по порядку публикации."""
+        response = self.client.get(
+            reverse('posts:profile_export', args=[self.author.username])
+        )
+        self.assertIn('attachment', response['Content-Disposition'])
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines[0], 'id,text,author,group,pub_date,image,'
+                                   'comments_count')
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].startswith(f'{self.posts[0].pk},"Пост, 0"'))
+        self.assertTrue(lines[1].endswith(',1'))
+
+    def test_group_export_jsonl(self):
+        """JSONL группы: по объекту поста на строку."""
+        response = self.client.get(
+            reverse('posts:group_export', args=[self.group.slug]),
+            {'format': 'jsonl'},
+        )
+        rows = [json.loads(line)
+                for line in self.content(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [self.posts[1].pk, self.posts[3].pk])
+        self.assertEqual(rows[0]['group'], 'group')
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            reverse('posts:group_export', args=[self.group.slug]),
+            {'format': 'xml'},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_site_export_is_staff_only(self):
+        """Выгрузка всего сайта только для персонала."""
+        url = reverse('posts:site_export', args=['comments'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        lines = self.content(self.client.get(url)).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Комментарий', lines[1])
+        response = self.client.get(
+            reverse('posts:site_export', args=['users'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+
+    def test_not_modified(self):
+        """Повторный запрос без изменений получает 304 без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with CaptureQueriesContext(connection) as context:
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+                # только дата новейшего поста (и автор для профиля)
+                self.assertLessEqual(len(context.captured_queries), 2)
+
+    def test_changes_invalidate(self):
+        """Новый пост, комментарий или подписка меняют ETag."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Новый пост', author=self.author,
+                            group=self.group)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200
+                )
+
+    def test_etag_per_user(self):
+        """У разных пользователей разные ETag."""
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_login_changes_etag(self):
+        """После повторного входа страница с формой приходит заново."""
+        self.reader.set_password('password')
+        self.reader.save()
+        credentials = {'username': 'reader', 'password': 'password'}
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.post(reverse('users:login'), credentials)
+        response = self.client.get(url)
+        self.client.get(reverse('users:logout'))
+        self.client.post(reverse('users:login'), credentials)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_edit_moves_last_modified(self):
+        """Правка поста сдвигает Last-Modified, хотя pub_date прежний."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        later = time.time() + 10
+        with mock.patch('core.cache.time.time', return_value=later):
+            self.post.text = 'Исправленный пост'
+            self.post.save()
+        again = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'Исправленный пост')
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        cls.post = Post.objects.create(text='Пост в группе',
+                                       author=cls.author, group=cls.group)
+        Post.objects.create(text='Чужой пост', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.post.refresh_from_db()
+
+    def test_feeds(self):
+        """Ленты отдают свои посты в RSS и Atom."""
+        cases = {
+            reverse('posts:index_rss'): ['Пост в группе', 'Чужой пост'],
+            reverse('posts:group_rss', args=['group']): ['Пост в группе'],
+            reverse('posts:author_rss', args=['other']): ['Чужой пост'],
+        }
+        for url, texts in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('rss', response['Content-Type'])
+                content = response.content.decode()
+                self.assertEqual(content.count('<item>'), len(texts))
+                for text in texts:
+                    self.assertIn(text, content)
+        response = self.client.get(reverse('posts:group_atom',
+                                           args=['group']))
+        self.assertIn('atom', response['Content-Type'])
+        self.assertContains(response, 'Пост в группе')
+
+    def test_feed_cached_until_post_changes(self):
+        """Лента берётся из кэша, пока пост не сохранят."""
+        url = reverse('posts:author_rss', args=['author'])
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.client.get(url), 'Пост в группе')
+        self.post.text = 'Правка'
+        self.post.save()
+        self.assertContains(self.client.get(url), 'Правка')
+
+    def test_moved_post_leaves_old_group_feed(self):
+        """Перенос поста сбрасывает ленты обеих групп."""
+        old_url = reverse('posts:group_rss', args=['group'])
+        new_url = reverse('posts:group_rss', args=['other'])
+        self.client.get(old_url)
+        self.client.get(new_url)
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotContains(self.client.get(old_url), 'Пост в группе')
+        self.assertContains(self.client.get(new_url), 'Пост в группе')
+
+    def test_feed_not_modified(self):
+        """Агрегатор получает 304, пока лента не изменилась."""
+        url = reverse('posts:index_atom')
+        response = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.client.force_login(self.author)
+        # лента одна на всех, ETag от пользователя не зависит
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}',
+                                 description='Описание')
+            for i in range(2)
+        ]
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=group)
+            for i, group in enumerate(cls.groups)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def rendered(self, url):
+        """True, если страницу рендерили, а не взяли из кэша."""
+        return self.client.get(url).context is not None
+
+    def test_anonymous_pages_cached(self):
+        """Анонимам страницы отдаются из кэша, с учётом query string."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group-0']),
+            reverse('posts:profile', args=['author']),
+            reverse('posts:post_detail', args=[self.posts[0].pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertTrue(self.rendered(url))
+                self.assertFalse(self.rendered(url))
+                self.assertTrue(self.rendered(f'{url}?page=1'))
+
+    def test_key_ignores_scheme_and_host(self):
+        """Прогрев по http годится для посетителей по https."""
+        url = reverse('posts:index')
+        self.assertTrue(self.rendered(url))
+        response = self.client.get(url, secure=True,
+                                   HTTP_HOST='localhost')
+        self.assertIsNone(response.context)
+
+    def test_commenter_rename(self):
+        """Смена имени комментатора обновляет ссылку в ветке поста."""
+        url = reverse('posts:post_detail', args=[self.posts[0].pk])
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Комментарий')
+        self.assertContains(self.client.get(url), '/profile/reader/')
+        reader = User.objects.get(pk=self.reader.pk)
+        reader.username = 'renamed'
+        reader.save()
+        response = self.client.get(url)
+        self.assertContains(response, '/profile/renamed/')
+        self.assertNotContains(response, '/profile/reader/')
+
+    def test_authenticated_not_cached(self):
+        url = reverse('posts:index')
+        self.client.force_login(self.reader)
+        self.assertTrue(self.rendered(url))
+        self.assertTrue(self.rendered(url))
+
+    def test_signals_purge_only_affected_pages(self):
+        """Изменение сбрасывает только страницы своих групп и постов."""
+        group_urls = [reverse('posts:group_list', args=[group.slug])
+                      for group in self.groups]
+        post_urls = [reverse('posts:post_detail', args=[post.pk])
+                     for post in self.posts]
+        profile_url = reverse('posts:profile', args=['reader'])
+        for url in group_urls + post_urls + [profile_url]:
+            self.rendered(url)
+        Post.objects.create(text='Новый', author=self.reader,
+                            group=self.groups[0])
+        self.assertTrue(self.rendered(group_urls[0]))
+        self.assertFalse(self.rendered(group_urls[1]))
+        self.assertTrue(self.rendered(profile_url))
+        for url in post_urls:
+            self.rendered(url)
+        Comment.objects.create(post=self.posts[1], author=self.reader,
+                               text='Комментарий')
+        self.assertFalse(self.rendered(post_urls[0]))
+        self.assertTrue(self.rendered(post_urls[1]))
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertTrue(self.rendered(profile_url))
+        self.assertFalse(self.rendered(group_urls[1]))
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def card_key(self, post):
+        post.refresh_from_db()
+        return make_template_fragment_key(
+            'post_card', [post.pk, post.updated_at, post.group_id]
+        )
+
+    def test_edit_replaces_only_its_card(self):
+        """Правка поста даёт новый ключ только его карточке."""
+        url = reverse('posts:profile', args=['author'])
+        self.client.get(url)
+        edited, untouched = self.posts
+        untouched_key = self.card_key(untouched)
+        old_key = self.card_key(edited)
+        self.assertIsNotNone(cache.get(old_key))
+        edited.text = 'Исправленный пост'
+        edited.save()
+        self.assertIn('Исправленный пост',
+                      self.client.get(url).content.decode())
+        self.assertNotEqual(self.card_key(edited), old_key)
+        self.assertIsNotNone(cache.get(self.card_key(edited)))
+        self.assertEqual(self.card_key(untouched), untouched_key)
+
+    def test_comment_touches_post(self):
+        """Новый комментарий сдвигает updated_at поста."""
+        post = self.posts[0]
+        before = self.card_key(post)
+        Comment.objects.create(post=post, author=self.author, text='Да')
+        self.assertNotEqual(self.card_key(post), before)
+
+    def test_group_and_author_changes(self):
+        """Удаление группы и смена имени автора обновляют карточки."""
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        Post.objects.filter(pk=self.posts[0].pk).update(group=group)
+        url = reverse('posts:profile', args=['author'])
+        self.assertContains(self.client.get(url), '/group/group/')
+        group.slug = 'renamed'
+        group.save()
+        self.assertContains(self.client.get(url), '/group/renamed/')
+        group.delete()
+        self.assertNotContains(self.client.get(url), '/group/renamed/')
+        self.author.first_name = 'Лев'
+        self.author.last_name = 'Толстой'
+        self.author.save()
+        self.assertContains(self.client.get(url), 'Лев Толстой')
+        before = self.card_key(self.posts[0])
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(self.card_key(self.posts[0]), before)
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batched_is_following(self):
+        """Пачка авторов проверяется одним запросом, повторно — из кэша."""
+        expected = {self.authors[0].pk: True, self.authors[1].pk: True,
+                    self.authors[2].pk: False}
+        with self.assertNumQueries(1):
+            self.assertEqual(is_following(self.reader, self.authors),
+                             expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                is_following(self.reader, [a.pk for a in self.authors]),
+                expected,
+            )
+
+    def test_follow_invalidates_only_its_keys(self):
+        """Подписка сбрасывает подписки подписчика и подписчиков автора."""
+        other = User.objects.create_user(username='other')
+        followees(self.reader.pk)
+        followees(other.pk)
+        followers(self.authors[2].pk)
+        followers(self.authors[0].pk)
+        self.client.force_login(self.reader)
+        self.client.get(
+            reverse('posts:profile_follow', args=['author2'])
+        )
+        self.assertIsNone(cache.get(FOLLOWEES_KEY.format(self.reader.pk)))
+        self.assertIsNone(
+            cache.get(FOLLOWERS_KEY.format(self.authors[2].pk))
+        )
+        self.assertIsNotNone(cache.get(FOLLOWEES_KEY.format(other.pk)))
+        self.assertIsNotNone(
+            cache.get(FOLLOWERS_KEY.format(self.authors[0].pk))
+        )
+        self.assertTrue(
+            is_following(self.reader, [self.authors[2]])[self.authors[2].pk]
+        )
+
+    @override_settings(COUNT_FOLLOWS=1)
+    def test_follow_lists_paginated(self):
+        """Списки подписок и подписчиков листаются по страницам."""
+        url = reverse('posts:profile_following', args=['reader'])
+        self.client.force_login(self.authors[2])
+        first = self.client.get(url)
+        second = self.client.get(url, {'page': 2})
+        self.assertEqual(first.context['page_obj'].paginator.count, 2)
+        self.assertEqual(
+            [first.context['page_obj'][0], second.context['page_obj'][0]],
+            self.authors[:2],
+        )
+        self.assertFalse(first.context['page_obj'][0].followed)
+        response = self.client.get(
+            reverse('posts:profile_followers', args=['author0'])
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.reader])
+
+
+class InvalidateOnCommitTests(TransactionTestCase):
+    # проверяется поведение на коммите, его нет внутри TestCase
+
+    def test_follow_invalidation_repeats_on_commit(self):
+        """Кэш, заполненный до коммита, сбрасывается после него."""
+        cache.clear()
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        with transaction.atomic():
+            Follow.objects.create(user=reader, author=author)
+            # конкурентный запрос до коммита ещё видит старые данные
+            cache.set(FOLLOWEES_KEY.format(reader.pk), b'', timeout=None)
+            generation = get_generation('follow', reader.pk)
+        self.assertIsNone(cache.get(FOLLOWEES_KEY.format(reader.pk)))
+        self.assertGreater(get_generation('follow', reader.pk), generation)
+        self.assertTrue(is_following(reader, [author])[author.pk])
@@ -0,0 +1,191 @@
+"""Фоновая нарезка миниатюр для картинок постов.
+
+Все геометрии, которые используют шаблоны, описаны в
+settings.POST_THUMBNAILS. После сохранения поста с картинкой миниатюры
+режутся в пуле потоков, а шаблон до готовности показывает заглушку
+(см. тег post_image) вместо того, чтобы резать картинку в запросе.
+Если у поста нет манифеста вариантов, нарезку ставит и сам шаблон;
+картинку, которую нарезать не удалось, не трогаем
+THUMBNAIL_RETRY_AFTER секунд.
+
+Там же режутся варианты шириной POST_IMAGE_WIDTHS для srcset. Их имена
+и ширины ложатся манифестом в Post.image_variants, и шаблон строит
+<img srcset> прямо из поля поста, не обращаясь к KV-хранилищу sorl.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.THUMBNAIL_WORKERS,
+    thread_name_prefix='thumbnails',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+FAILED_KEY = 'thumbnails:failed:{}'
+
+
+class LookupBackend(ThumbnailBackend):
+    """Находит готовую миниатюру в KV-хранилище sorl, ничего не создавая."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры, которую нарезал бы get_thumbnail."""
+        source = ImageFile(file_)
+        # нормализация опций повторяет ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+lookup_backend = LookupBackend()
+
+
+def cached_thumbnail(image, preset):
+    geometry, options = settings.POST_THUMBNAILS[preset]
+    return lookup_backend.get_cached_thumbnail(image, geometry, **options)
+
+
+def cached_thumbnails(images, preset):
+    """cached_thumbnail для всех картинок страницы разом.
+
+    Возвращает {имя картинки: миниатюра или None}. Ключи KV-хранилища
+    читаются одним get_many из кэша, промахи — одним запросом к таблице
+    sorl, так что страница стоит одного обращения, а не десяти.
+    """
+    if not isinstance(default.kvstore, CachedDbKVStore):
+        return {
+            image.name: cached_thumbnail(image, preset) for image in images
+        }
+    geometry, options = settings.POST_THUMBNAILS[preset]
+    keys = {
+        add_prefix(lookup_backend.thumbnail_file(
+            image, geometry, **options
+        ).key): image.name
+        for image in images
+    }
+    if not keys:
+        return {}
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # как KVStore._get_raw: отсутствие тоже кэшируем
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {
+        name: (None if found[key] in (EMPTY_VALUE, None, '')
+               else deserialize_image_file(found[key]))
+        for key, name in keys.items()
+    }
+
+
+def variants(post):
+    """Манифест вариантов картинки поста или None, если его ещё нет."""
+    if not post.image or not post.image_variants:
+        return None
+    try:
+        manifest = json.loads(post.image_variants)
+    except ValueError:
+        return None
+    # картинку заменили, а варианты ещё от старой
+    if not isinstance(manifest, dict) or (
+        manifest.get('source') != post.image.name
+    ):
+        return None
+    return manifest
+
+
+def generate_variants(name):
+    """Режет варианты для srcset и записывает манифест постам с name."""
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    widths = {}
+    for width in settings.POST_IMAGE_WIDTHS:
+        height = round(width * aspect_height / aspect_width)
+        # без upscale: у маленького оригинала варианты совпадут
+        thumbnail = get_thumbnail(name, f'{width}x{height}', crop='center')
+        widths.setdefault(thumbnail.width, thumbnail.name)
+    manifest = {
+        'source': name,
+        'variants': sorted(widths.items()),
+    }
+    Post.objects.filter(image=name).update(
+        image_variants=json.dumps(manifest), updated_at=timezone.now()
+    )
+
+
+def generate_thumbnails(name, on_done=None):
+    """Режет миниатюры из POST_THUMBNAILS и варианты для файла name."""
+    try:
+        for geometry, options in settings.POST_THUMBNAILS.values():
+            get_thumbnail(name, geometry, **options)
+        generate_variants(name)
+        if on_done is not None:
+            on_done()
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры для %s', name)
+        # битая или пропавшая картинка: не пробуем на каждом показе
+        cache.set(FAILED_KEY.format(name), True,
+                  settings.THUMBNAIL_RETRY_AFTER)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def _generate_in_worker(name, on_done):
+    try:
+        generate_thumbnails(name, on_done)
+    finally:
+        # соединения потока пула никто, кроме нас, не закроет
+        close_old_connections()
+
+
+def schedule_thumbnails(name, on_done=None):
+    """Ставит нарезку name в очередь, если она не идёт и не падала."""
+    if cache.get(FAILED_KEY.format(name)):
+        return
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if settings.THUMBNAIL_BACKGROUND:
+        _executor.submit(_generate_in_worker, name, on_done)
+    else:
+        generate_thumbnails(name, on_done)
@@ -1,18 +1,40 @@
+from operator import attrgetter
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import SimpleLazyObject
 
-from .models import Post, Group, User, Comment, Follow
+from core.db_router import read_from_replica
+
+from . import export
+from .follow_graph import followees, followers, is_following
+from .conditional import (conditional_page, group_page, index_page,
+                          page_scopes, post_page, profile_page)
+from .page_cache import anonymous_page_cache
+from .models import Post, Group, User, Comment, Follow, Timeline
 from .forms import PostForm, CommentForm
+from .paginators import CursorPaginator, thread_page
+from .search import search_page
+from .suggestions import suggestions_for
 
 
-def paginator(posts, request):
-    pag = Paginator(posts, settings.COUNT_POSTS)
+def paginator(posts, request, **kwargs):
+    pag = CursorPaginator(posts, settings.COUNT_POSTS, **kwargs)
+    cursor = request.GET.get('cursor')
     page_number = request.GET.get('page')
-    return pag.get_page(page_number)
+    if page_number and not cursor:
+        # старые ссылки ?page=N: OFFSET и COUNT(*), новых таких нет
+        return pag.get_page(page_number)
+    return pag.get_cursor_page(cursor)
 
 
+@read_from_replica(scopes=page_scopes(index_page))
+@conditional_page(index_page)
+@anonymous_page_cache(index_page)
 def index(request):
     post_list = Post.objects.select_related('author', 'group').all()
     page_obj = paginator(post_list, request)
@@ -22,6 +44,21 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_page(
+        query, request.GET.get('cursor'), settings.COUNT_POSTS
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_from_replica(scopes=page_scopes(group_page))
+@conditional_page(group_page)
+@anonymous_page_cache(group_page)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author').all()
@@ -33,26 +70,41 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@read_from_replica(scopes=page_scopes(profile_page))
+@conditional_page(profile_page)
+@anonymous_page_cache(profile_page)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     posts = author.posts.select_related('group').all()
     page_obj = paginator(posts, request)
     template = 'posts/profile.html'
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
+    following = is_following(request.user, [author])[author.pk]
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'suggestions': (
+            suggestions_for(request.user) if request.user == author else []
+        ),
     }
     return render(request, template, context)
 
 
+@read_from_replica(scopes=page_scopes(post_page))
+@conditional_page(post_page)
+@anonymous_page_cache(post_page)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    # страница ветки запрашивается, только если её фрагмента нет в кэше
+    comments = SimpleLazyObject(lambda: thread_page(
+        Comment.objects.filter(post=post).select_related('author'),
+        request.GET.get('cursor'),
+        settings.COUNT_COMMENTS,
+    ))
     context = {
         'post': post,
         'form': CommentForm(),
@@ -105,12 +157,22 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+# фрагменты ленты подписок версионируются самими строками Timeline и
+# постов, под поколения из реплики ничего не ложится
+@read_from_replica
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user.id)
-    page_obj = paginator(post_list, request)
+    entries = Timeline.objects.filter(
+        user=request.user
+    ).select_related('post__author', 'post__group')
+    page_obj = paginator(
+        entries, request,
+        key=('pub_date', 'post_id'),
+        unwrap=attrgetter('post'),
+    )
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions_for(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -134,3 +196,72 @@ def profile_unfollow(request, username):
         user=request.user
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+def follow_list(request, username, ids_of, title):
+    author = get_object_or_404(User, username=username)
+    page_obj = Paginator(
+        ids_of(author.pk), settings.COUNT_FOLLOWS
+    ).get_page(request.GET.get('page'))
+    users = User.objects.in_bulk(list(page_obj.object_list))
+    page_obj.object_list = [
+        users[pk] for pk in page_obj.object_list if pk in users
+    ]
+    following = is_following(request.user, page_obj.object_list)
+    for user in page_obj.object_list:
+        user.followed = following[user.pk]
+    context = {
+        'author': author,
+        'title': title,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@read_from_replica
+def profile_followers(request, username):
+    return follow_list(request, username, followers, 'Подписчики')
+
+
+@read_from_replica
+def profile_following(request, username):
+    return follow_list(request, username, followees, 'Подписки')
+
+
+def export_response(request, queryset, kind, filename):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.FORMATS:
+        return HttpResponseBadRequest('Формат выгрузки: csv или jsonl')
+    response = StreamingHttpResponse(
+        export.render(queryset, kind, export_format),
+        content_type=export.FORMATS[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(
+        request, author.posts.all(), 'posts', f'posts-user-{author.pk}'
+    )
+
+
+@login_required
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        request, group.posts.all(), 'posts', f'posts-group-{group.slug}'
+    )
+
+
+@staff_member_required
+def site_export(request, kind):
+    if kind not in export.MODELS:
+        raise Http404
+    return export_response(
+        request, export.MODELS[kind].objects.all(), kind, kind
+    )
@@ -0,0 +1,109 @@
+"""Прогрев кэша после деплоя или перезапуска.
+
+Первые страницы главной, каждой группы и профили самых популярных
+авторов запрашиваются анонимно прямо через WSGIHandler, поэтому
+заполняются те же записи, что и у настоящих посетителей: целые
+страницы из posts/page_cache.py, фрагменты страниц и карточки постов.
+Ключ страницы — путь с query string, без схемы и хоста, так что
+прогретые записи достаются посетителям на любом адресе сайта; Host
+запроса прогрева должен лишь проходить проверку ALLOWED_HOSTS.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from .models import Group, Post, UserStats
+from .paginators import CursorPaginator
+from .templatetags.pagination import next_cursor
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'warmup:running'
+
+
+def _pages(url, posts, limit):
+    """Первая страница ленты и следующие по курсору, как их листают."""
+    paginator = CursorPaginator(posts, settings.COUNT_POSTS)
+    page = paginator.get_cursor_page(None)
+    yield url
+    for _ in range(limit - 1):
+        if not page.has_next():
+            return
+        cursor = next_cursor(page)
+        yield f'{url}?cursor={cursor}'
+        page = paginator.get_cursor_page(cursor)
+
+
+def warmup_urls(pages, profiles):
+    """Адреса для прогрева: страниц дальше последней не бывает."""
+    yield from _pages(reverse('posts:index'), Post.objects.all(), pages)
+    for group in Group.objects.order_by('pk'):
+        yield from _pages(
+            reverse('posts:group_list', args=[group.slug]),
+            group.posts.all(), pages,
+        )
+    top = UserStats.objects.order_by(
+        '-followers_count'
+    ).select_related('user')[:profiles]
+    for stats in top:
+        yield from _pages(
+            reverse('posts:profile', args=[stats.user.username]),
+            stats.user.posts.all(), pages,
+        )
+
+
+def _fetch(handler, url, host):
+    started = time.perf_counter()
+    environ = RequestFactory(HTTP_HOST=host).get(url).environ
+    response = handler(environ, lambda status, headers: None)
+    # close() шлёт request_finished, и соединения потока закрываются
+    # так же, как после настоящего запроса
+    response.close()
+    return url, response.status_code, (
+        (time.perf_counter() - started) * 1000
+    )
+
+
+def warm(urls, workers, host):
+    """Запрашивает urls в workers потоках, отдаёт (url, статус, мс).
+
+    Запросы идут прямо в WSGI-обработчик, со всеми middleware, но без
+    сети. Тестовый Client тут не годится: пока он работает, он
+    отключает закрытие соединений с базой для всего процесса.
+    """
+    handler = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix='warmup') as pool:
+        yield from pool.map(
+            lambda url: _fetch(handler, url, host), list(urls)
+        )
+
+
+def _warm_on_startup():
+    try:
+        for url, status, ms in warm(
+            warmup_urls(settings.CACHE_WARMUP_PAGES,
+                        settings.CACHE_WARMUP_PROFILES),
+            settings.CACHE_WARMUP_WORKERS, settings.CACHE_WARMUP_HOST,
+        ):
+            logger.info('Прогрев %s: %s за %.0f мс', url, status, ms)
+    except Exception:
+        logger.exception('Прогрев кэша не удался')
+    finally:
+        close_old_connections()
+
+
+def warm_in_background():
+    """Прогрев при старте воркера; из нескольких воркеров греет один."""
+    if cache.add(LOCK_KEY, True, timeout=settings.CACHE_WARMUP_LOCK):
+        threading.Thread(
+            target=_warm_on_startup, name='warmup', daemon=True
+        ).start()
@@ -26,8 +26,28 @@ SECRET_KEY = 'pt!=7^30w4@$mha2kdbijwm%s7tu1@4umf-$pq-^y&jqsmjl^2'
 DEBUG = True
 
 COUNT_POSTS: int = 10
+COUNT_COMMENTS: int = 50
+COUNT_FOLLOWS: int = 50
+# «кого почитать», см. posts/suggestions.py
+SUGGESTIONS_TOP_K: int = 10
+SUGGESTIONS_WEIGHTS = {'follow': 1.0, 'comment': 0.5}
+SUGGESTIONS_BATCH_SIZE: int = 1000
+COUNT_FEED_ITEMS: int = 20
+# страницы для анонимов сбрасывают сигналы, см. posts/page_cache.py
+PAGE_CACHE_TIMEOUT: int = 6 * 60 * 60
+# прогрев кэша после деплоя, см. posts/warmup.py и yatube/wsgi.py
+CACHE_WARMUP_ON_STARTUP = os.getenv('YATUBE_WARMUP') == '1'
+# Host запросов прогрева: любой из ALLOWED_HOSTS, в ключи кэша не входит
+CACHE_WARMUP_HOST = os.getenv('YATUBE_WARMUP_HOST', 'localhost')
+CACHE_WARMUP_PAGES: int = 3
+CACHE_WARMUP_PROFILES: int = 20
+CACHE_WARMUP_WORKERS: int = 4
+# пока ключ жив, другие воркеры прогрев не начинают
+CACHE_WARMUP_LOCK: int = 10 * 60
 TEST_LEN_TEXT: int = 15
 THREE_POSTS: int = 3
+TIMELINE_BATCH_SIZE: int = 500
+EXPORT_CHUNK_SIZE: int = 2000
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -54,7 +74,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -97,6 +119,53 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения, пути через запятую:
+# YATUBE_DB_REPLICAS=replica1.sqlite3,replica2.sqlite3. Копирует данные
+# в них внешняя репликация; локально хватит cp db.sqlite3 replica1.sqlite3.
+REPLICA_DATABASES = []
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        # в тестах реплика — то же соединение, что и default
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+# PRAGMA для каждого соединения с SQLite, см. core/signals.py; профиль
+# выбирается переменной YATUBE_SQLITE_PROFILE. WAL не даёт записи
+# блокировать читателей, busy_timeout ждёт освобождения записи вместо
+# «database is locked», synchronous=NORMAL в режиме WAL не теряет
+# целостность, только последние транзакции при отключении питания.
+SQLITE_PROFILES = {
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,  # в КиБ
+        'mmap_size': 256 * 1024 * 1024,
+    },
+    'development': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+    },
+    'off': {},
+}
+SQLITE_PRAGMAS = SQLITE_PROFILES[os.getenv(
+    'YATUBE_SQLITE_PROFILE', 'development' if DEBUG else 'production'
+)]
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# сколько секунд после записи браузер читает с primary
+REPLICA_PIN_SECONDS: int = 5
+# на сколько секунд реплики могут отставать: страницы, чьи поколения
+# кэша сдвигали позже, читают с primary, см. core/db_router.py
+REPLICA_MAX_LAG: int = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -149,8 +218,60 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Server-Timing и лог yatube.performance, см. core/middleware.py;
+# включается переменной окружения YATUBE_PERFORMANCE=1
+PERFORMANCE_INSTRUMENTATION = os.getenv('YATUBE_PERFORMANCE') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# см. posts/search.py; для СУБД без FTS5 — posts.search.SimpleBackend
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+POSTS_ADMIN_SEARCH_LIMIT = 1000
+
+# геометрии миниатюр, которые используют шаблоны; режутся заранее
+# в фоне после сохранения поста, см. posts/thumbnails.py
+POST_THUMBNAILS = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# ширины вариантов для srcset; пропорции как у миниатюры ленты
+POST_IMAGE_WIDTHS = (320, 640, 960, 1440)
+POST_IMAGE_ASPECT = (960, 339)
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_BACKGROUND = True
+# через сколько секунд снова пробовать картинку, которую не удалось нарезать
+THUMBNAIL_RETRY_AFTER = 60 * 60
+
+# нормализация загружаемых картинок, см. posts/images.py;
+# POST_IMAGE_FORMAT — ключ posts.images.EXTENSIONS
+POST_IMAGE_MAX_SIZE = (2048, 2048)
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_SPOOL_SIZE = 2 * 1024 * 1024
+
+# общий для всех воркеров на хосте кэш, см. core/cache_backends.py
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+# тесты работают с кэшем во временном каталоге, см. core/test_runner.py
+TEST_RUNNER = 'core.test_runner.TemporaryCacheRunner'